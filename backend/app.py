@@ -1,53 +1,595 @@
 import os
+import io
+import time
 import uuid
-from datetime import datetime, timedelta
+import hashlib
+import logging
+import pstats
+import cProfile
+from functools import wraps
+from datetime import datetime, timedelta, timezone
 from werkzeug.utils import secure_filename
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from supabase import create_client, Client
+from supabase import Client
+from postgrest.types import ReturnMethod, CountMethod
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
+from client import create_pooled_client
+from cache import ResponseCache, SupabaseGenerationStore, make_etag
+from idempotency import SupabaseIdempotencyStore, REPLAY, IN_PROGRESS, MISMATCH
+from jobs import JobScheduler, JobBusyError, SupabaseJobStore
+from uploads import UploadQueue
+from images import image_processing_available, process_profile_image, IMAGE_CONTENT_TYPE, IMAGE_EXTENSION
+from importer import IMPORT_COLUMNS, ImportRowError, iter_rows, validate_student, batched
+from export import EXPORT_FORMATS, encode_rows, gzip_chunks
+from compression import COMPRESSIBLE_MIMETYPES, choose_encoding, compress
+import metrics
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; Flask's standard library encoder is used without it
+    orjson = None
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"])
 
 # Configuration for self-hosted Supabase
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "http://localhost:8000")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")  # No default - should be set in .env
 BUCKET = os.environ.get("SUPABASE_BUCKET", "student-photos")
 
+# Pagination for student listings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STUDENT_COLUMNS = [
+    "id", "student_id", "name", "father_name", "email", "phone", "phone2",
+    "emergency_contact", "dob", "address", "profile_pic_url", "profile_thumb_url", "gender",
+    "course", "session",
+]
+STUDENT_FILTERS = ["course", "gender", "session"]
+
+# Student search (search_students in readme.md)
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_LENGTH = 100
+
+# Response cache for listings (invalidated by the write routes below)
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 30))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 256))
+CACHED_HEADERS = ["X-Next-Cursor"]
+# With several worker processes, invalidations must reach every worker: keep the
+# cache generations in Postgres (cache_generations in readme.md). gunicorn.conf.py
+# turns this on whenever it starts more than one worker.
+CACHE_SHARED_INVALIDATION = os.environ.get("CACHE_SHARED_INVALIDATION", "0") == "1"
+
+# Responses at least this large are gzip/brotli compressed when the client accepts it
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+
+# Idempotency-Key support for retried writes (/submit, /fees/pay); keys are
+# shared by all workers through Postgres (idempotency_keys in readme.md)
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))
+IDEMPOTENCY_PENDING_TIMEOUT = float(os.environ.get("IDEMPOTENCY_PENDING_TIMEOUT", 60))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+REPLAYED_HEADERS = ["Content-Type", "Location"]
+
+# Profile photo uploads: "sync" uploads before the student insert,
+# "background" inserts first and attaches the photo from a worker pool.
+# In both modes resizing and thumbnails run on the worker pool.
+PHOTO_UPLOAD_MODE = os.environ.get("PHOTO_UPLOAD_MODE", "sync")
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 2))
+UPLOAD_QUEUE_SIZE = int(os.environ.get("UPLOAD_QUEUE_SIZE", 100))
+UPLOAD_RETRIES = int(os.environ.get("UPLOAD_RETRIES", 3))
+
+# Bulk student import
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_BATCH_SIZE = 5000
+MAX_IMPORT_ERRORS = 1000
+
+# Streaming exports
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 1000))
+FEE_EXPORT_COLUMNS = ["id", "student_id", "name", "course", "status", "amount", "last_date"]
+
+# Fee ledger (single table replacing fees_paid / fees_unpaid / fees_overdue).
+# Student names are not copied into the ledger; they are embedded at read time
+# through the fee_ledger.student_id -> students.student_id foreign key.
+FEE_LEDGER = "fee_ledger"
+FEE_LEDGER_SELECT = "*, students(name)"
+FEE_STATUSES = ["paid", "unpaid", "overdue"]
+LEGACY_FEE_TABLES = {"fees_paid": "paid", "fees_unpaid": "unpaid", "fees_overdue": "overdue"}
+MIGRATION_PAGE_SIZE = 1000
+# Ids go into `in.(...)` filters in the query string: cap a batch request and
+# split the ids over several queries so no URL nears gateway limits (414)
+MAX_HISTORY_BATCH_SIZE = 500
+LEDGER_IN_CHUNK_SIZE = 100
+
+# Scheduled maintenance jobs (intervals in seconds, 0 = manual only).
+# JOBS_ENABLED=0 turns the in-process scheduler off, e.g. when a
+# `flask --app app run-jobs` sidecar runs them instead.
+JOBS_ENABLED = os.environ.get("JOBS_ENABLED", "1") == "1"
+JOB_OVERDUE_SWEEP_INTERVAL = float(os.environ.get("JOB_OVERDUE_SWEEP_INTERVAL", 3600))
+# Deletes storage objects, so it only runs on a schedule when an interval is set
+JOB_ORPHANED_PHOTOS_INTERVAL = float(os.environ.get("JOB_ORPHANED_PHOTOS_INTERVAL", 0))
+JOB_FEE_SUMMARY_INTERVAL = float(os.environ.get("JOB_FEE_SUMMARY_INTERVAL", 24 * 3600))
+JOB_IDEMPOTENCY_CLEANUP_INTERVAL = float(os.environ.get("JOB_IDEMPOTENCY_CLEANUP_INTERVAL", 3600))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 600))
+# Photos newer than this are never treated as orphans (their student row may not be written yet)
+ORPHAN_PHOTO_GRACE_HOURS = 24
+STORAGE_LIST_PAGE_SIZE = 100
+# Set to require an X-Admin-Token header on manual job triggers
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Dashboard aggregates, maintained by triggers on fee_ledger (see readme.md)
+FEE_SUMMARY = "fee_summary"
+FEE_COLLECTIONS = "fee_collections_monthly"
+
+# Request instrumentation: requests slower than SLOW_REQUEST_MS are logged (0 disables).
+# With PROFILE_REQUESTS=1 a request sent with "X-Profile: <PROFILE_TOKEN>" is run
+# under cProfile; the top functions are logged and, if PROFILE_DIR is set, saved.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "1")
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_TOP_FUNCTIONS = 30
+
 if not SUPABASE_KEY:
     raise ValueError("SUPABASE_KEY environment variable is required")
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Initialize Supabase client (pooled, with timeouts, retries and a circuit breaker; see client.py)
+supabase: Client
+supabase, supabase_transport = create_pooled_client(SUPABASE_URL, SUPABASE_KEY)
+
+response_cache = ResponseCache(
+    ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+    shared=SupabaseGenerationStore(lambda: supabase) if CACHE_SHARED_INVALIDATION else None,
+)
+upload_queue = UploadQueue(workers=UPLOAD_WORKERS, max_pending=UPLOAD_QUEUE_SIZE, retries=UPLOAD_RETRIES)
+idempotency_store = SupabaseIdempotencyStore(lambda: supabase, ttl=IDEMPOTENCY_TTL,
+                                             pending_timeout=IDEMPOTENCY_PENDING_TIMEOUT)
+job_scheduler = JobScheduler(SupabaseJobStore(lambda: supabase), lease_seconds=JOB_LEASE_SECONDS)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes with orjson when it is installed (same sorted keys,
+    compact or indented like Flask's own output) and adds encoding time to the
+    current request's metrics
+    """
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            option = self.orjson_option(kwargs)
+            if option is not None:
+                return orjson.dumps(obj, default=self.default, option=option).decode()
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.record_serialization(time.perf_counter() - started)
+
+    def orjson_option(self, kwargs: dict):
+        """
+        orjson options equivalent to the standard library arguments, or None if
+        orjson is missing or cannot produce that output. response() (jsonify)
+        always passes compact separators, or indent=2 in debug mode.
+        """
+        if orjson is None:
+            return None
+        kwargs = dict(kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.pop("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        for name, value in kwargs.items():
+            if name == "separators" and tuple(value) == (",", ":"):
+                continue
+            if name == "indent" and value == 2:
+                option |= orjson.OPT_INDENT_2
+                continue
+            return None
+        return option
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+    if PROFILE_REQUESTS and request.headers.get("X-Profile") == PROFILE_TOKEN:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request_metrics(response):
+    """
+    Record per-request metrics, add a Server-Timing header and log slow requests.
+    Supabase calls made while a streamed body is sent are not included.
+    """
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    summary = metrics.end_request(route, request.method, response.status_code, response.content_length)
+    if summary is None:
+        return response
+
+    response.headers["Server-Timing"] = (
+        f"db;dur={summary['db_ms']};desc=\"{summary['db_calls']} calls\", "
+        f"serialize;dur={summary['serialize_ms']}, total;dur={summary['duration_ms']}"
+    )
+    if SLOW_REQUEST_MS and summary["duration_ms"] >= SLOW_REQUEST_MS:
+        app.logger.warning("Slow request %s %s (%s): %s", request.method, request.full_path, route, summary)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        app.logger.info("Profile for %s %s:\n%s", request.method, request.full_path, report.getvalue())
+        if PROFILE_DIR:
+            profile_path = os.path.join(PROFILE_DIR, f"{int(time.time())}-{request.endpoint}-{uuid.uuid4().hex[:8]}.prof")
+            profiler.dump_stats(profile_path)
+            response.headers["X-Profile-File"] = os.path.basename(profile_path)
+    return response
+
+def cached_response(namespace: str):
+    """
+    Serve a GET listing from the response cache.
+    Cached bodies are already serialized, and a matching If-None-Match gets a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            entry, generation = response_cache.lookup(namespace, key)
+
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "etag": make_etag(body),
+                    "headers": {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                }
+                response_cache.set(namespace, key, entry, generation=generation)
+
+            # Weak comparison: compressed variants carry a weak ETag
+            if request.if_none_match.contains_weak(entry["etag"]):
+                response = Response(status=304)
+                response.set_etag(entry["etag"])
+                return response
+
+            response = Response(entry["body"], mimetype="application/json", headers=entry["headers"])
+            response.set_etag(entry["etag"])
+            # Compressed bodies are kept with the entry, so each is compressed once
+            return compress_response(response, entry.setdefault("encoded", {}))
+        return wrapper
+    return decorator
+
+def compress_response(response, variants: dict = None):
+    """
+    gzip/brotli-encode a buffered response when the client accepts it and the
+    body is at least COMPRESS_MIN_SIZE. `variants` memoizes encoded bodies.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    if variants is not None and encoding in variants:
+        encoded = variants[encoding]
+    else:
+        encoded = compress(body, encoding)
+        if variants is not None:
+            variants[encoding] = encoded
+
+    response.set_data(encoded)
+    response.headers["Content-Encoding"] = encoding
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.after_request
+def compress_after_request(response):
+    # Registered after finish_request_metrics, so it runs first and metrics see wire sizes
+    return compress_response(response)
+
+def to_columns(rows: list) -> dict:
+    """
+    Columnar form of a listing: one array per column instead of repeating
+    every key on every row
+    """
+    names = list(dict.fromkeys(key for row in rows for key in row))
+    return {
+        "length": len(rows),
+        "columns": {name: [row.get(name) for row in rows] for name in names}
+    }
+
+def listing_response(rows: list):
+    """
+    JSON response for a listing; ?format=columns opts into the columnar form
+    """
+    if request.args.get("format") == "columns":
+        return jsonify(to_columns(rows))
+    return jsonify(rows)
+
+def request_fingerprint() -> str:
+    """
+    Hash of what a write request asks for, so a reused Idempotency-Key with a
+    different payload is rejected. Multipart forms are hashed field by field
+    (the boundary changes between retries); other bodies byte for byte.
+    """
+    digest = hashlib.sha256(f"{request.method} {request.path}".encode())
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"\0{name}={value}".encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"\0{name}:{file.filename}:".encode())
+            digest.update(hashlib.sha256(file.read()).digest())
+            file.seek(0)
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header: the first request with a key runs and
+    its response (anything but a 5xx) is stored; retries with the same key and
+    payload, on any worker, get that response replayed without running the write again.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        key = f"{request.path}:{key}"
+        try:
+            outcome, stored = idempotency_store.begin(key, request_fingerprint())
+        except Exception as e:
+            # Without the claim the write could run twice; the client retries with the same key
+            app.logger.exception("Could not claim Idempotency-Key")
+            return jsonify({"error": f"Could not check Idempotency-Key: {e}"}), 503
+        if outcome == MISMATCH:
+            return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+        if outcome == IN_PROGRESS:
+            return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+        if outcome == REPLAY:
+            response = Response(stored["body"], status=stored["status"], headers=stored["headers"])
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            release_idempotency_key(key)
+            raise
 
-def upload_to_storage(file_path: str, storage_path: str) -> str:
+        if response.status_code >= 500 or response.is_streamed:
+            # Not a final answer: let the client retry with the same key
+            release_idempotency_key(key)
+        else:
+            try:
+                idempotency_store.complete(key, {
+                    "status": response.status_code,
+                    "body": response.get_data(),
+                    "headers": {h: response.headers[h] for h in REPLAYED_HEADERS if h in response.headers}
+                })
+            except Exception:
+                # The write is done; retries get a 409 until the claim's pending timeout runs out
+                app.logger.exception("Could not store the response for an Idempotency-Key")
+        return response
+    return wrapper
+
+def release_idempotency_key(key: str) -> None:
+    try:
+        idempotency_store.abort(key)
+    except Exception:
+        # The claim expires after IDEMPOTENCY_PENDING_TIMEOUT
+        app.logger.exception("Could not release an Idempotency-Key")
+
+def storage_public_url(storage_path: str) -> str:
+    return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET}/{storage_path}"
+
+def admin_required(view):
     """
-    Upload file to self-hosted Supabase Storage
+    Require X-Admin-Token when ADMIN_TOKEN is configured
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+            return jsonify({"error": "Admin token required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def upload_to_storage(content: bytes, storage_path: str, content_type: str = None) -> str:
+    """
+    Upload file contents to self-hosted Supabase Storage (no temporary file on disk)
     """
     try:
-        with open(file_path, 'rb') as f:
-            # Upload the file
-            res = supabase.storage.from_(BUCKET).upload(
-                path=storage_path,
-                file=f
-            )
+        # Paths are unique, so upsert only matters when a retried upload already landed
+        file_options = {"upsert": "true"}
+        if content_type:
+            file_options["content-type"] = content_type
+        res = supabase.storage.from_(BUCKET).upload(
+            path=storage_path,
+            file=content,
+            file_options=file_options # type: ignore
+        )
         
         # Check for errors
         if hasattr(res, 'error') and res.error: # type: ignore
             raise Exception(f"Storage upload error: {res.error}") # type: ignore
             
         # Get public URL for self-hosted Supabase
-        public_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET}/{storage_path}"
-        return public_url
+        return storage_public_url(storage_path)
         
     except Exception as e:
         raise Exception(f"Failed to upload to storage: {str(e)}")
 
+def attach_profile_pic(student_id: str, content: bytes, storage_path: str, content_type: str = None,
+                       original_url: str = None) -> None:
+    """
+    Store the photo of an already inserted student: a size-bounded WebP copy
+    plus a thumbnail next to it. If Pillow is missing or the image cannot be
+    decoded, the original is kept (and uploaded if `original_url` is not set).
+    """
+    update = {}
+    processed = None
+    if image_processing_available():
+        try:
+            processed = process_profile_image(content)
+        except Exception as e:
+            # Any decode failure (including Pillow's DecompressionBombError, which is not
+            # an OSError) keeps the original; raising here would make the queue retry and drop it
+            app.logger.warning("Image processing failed for %s, keeping original: %s", student_id, e)
+
+    if processed:
+        image, thumbnail = processed
+        base_path = os.path.splitext(storage_path)[0]
+        update["profile_pic_url"] = upload_to_storage(image, base_path + IMAGE_EXTENSION, IMAGE_CONTENT_TYPE)
+        update["profile_thumb_url"] = upload_to_storage(thumbnail, base_path + "_thumb" + IMAGE_EXTENSION, IMAGE_CONTENT_TYPE)
+    elif original_url is None:
+        update["profile_pic_url"] = upload_to_storage(content, storage_path, content_type)
+
+    if update:
+        supabase.table("students").update(update).eq("student_id", student_id).execute()
+        response_cache.invalidate("students")
+        app.logger.info("Uploaded image to: %s", update["profile_pic_url"])
+
+    if processed and original_url and update["profile_pic_url"] != original_url:
+        # The full-size original is no longer referenced by the student row
+        supabase.storage.from_(BUCKET).remove([storage_path])
+
+def parse_amount(value):
+    """
+    Convert an API amount (number or numeric string) for the numeric ledger column
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {value}")
+
+def ledger_row_to_fee(row: dict) -> dict:
+    """
+    Present a fee_ledger row (selected with FEE_LEDGER_SELECT) in the shape
+    of the old per-status tables
+    """
+    student = row.get("students") or {}
+    fee = {
+        "id": row["id"],
+        "student_id": row["student_id"],
+        "name": student.get("name"),
+        "amount": row.get("amount"),
+    }
+    if row["status"] == "paid":
+        fee["date"] = row.get("paid_date")
+    else:
+        fee["due_date"] = row.get("due_date")
+    return fee
+
+def ledger_query(client, student_id: str = None, student_ids: list = None):
+    """
+    Build (without executing) a ledger query for one, many or all students.
+    Works with both the sync and the async Supabase client.
+    """
+    query = client.table(FEE_LEDGER).select(FEE_LEDGER_SELECT)
+    if student_id is not None:
+        query = query.eq("student_id", student_id)
+    elif student_ids is not None:
+        query = query.in_("student_id", student_ids)
+    return query.order("id")
+
+def split_fees(rows: list) -> tuple:
+    """
+    Split ledger rows into (paid, unpaid, overdue) lists of fee records
+    """
+    fees = {status: [] for status in FEE_STATUSES}
+    for row in rows:
+        fees[row["status"]].append(ledger_row_to_fee(row))
+    return fees["paid"], fees["unpaid"], fees["overdue"]
+
+def fetch_fees(student_id: str = None, student_ids: list = None) -> tuple:
+    """
+    Read ledger rows, optionally for one or many students, and split them into
+    (paid, unpaid, overdue) lists. Many students are read LEDGER_IN_CHUNK_SIZE
+    ids per query; each student's rows stay in one query, ordered by id.
+    """
+    if student_ids is None:
+        return split_fees(ledger_query(supabase, student_id).execute().data)
+
+    rows = []
+    for chunk in batched(student_ids, LEDGER_IN_CHUNK_SIZE):
+        rows += ledger_query(supabase, student_ids=chunk).execute().data
+    return split_fees(rows)
+
+def fetch_fees_by_status(status: str) -> list:
+    rows = supabase.table(FEE_LEDGER).select(FEE_LEDGER_SELECT).eq("status", status).order("id").execute().data
+    return [ledger_row_to_fee(row) for row in rows]
+
+def index_by_student(rows: list) -> dict:
+    """
+    Map student_id -> first fee row for that student (single pass)
+    """
+    index = {}
+    for row in rows:
+        index.setdefault(row.get("student_id"), row)
+    return index
+
+def resolve_fee_status(students: list, paid: list, unpaid: list, overdue: list) -> list:
+    """
+    Resolve each student's fee status (priority: overdue > paid > unpaid)
+    using student_id-keyed indexes instead of scanning every fee table per student
+    """
+    paid_index = index_by_student(paid)
+    unpaid_index = index_by_student(unpaid)
+    overdue_index = index_by_student(overdue)
+
+    result = []
+    for s in students:
+        status = "unpaid"  # Default status
+        amount = None
+        last_date = None
+
+        overdue_entry = overdue_index.get(s["student_id"])
+        paid_entry = paid_index.get(s["student_id"])
+        unpaid_entry = unpaid_index.get(s["student_id"])
+
+        if overdue_entry:
+            status = "overdue"
+            amount = overdue_entry.get("amount")
+        elif paid_entry:
+            status = "paid"
+            amount = paid_entry.get("amount")
+            last_date = paid_entry.get("date")
+        elif unpaid_entry:
+            status = "unpaid"
+            amount = unpaid_entry.get("amount")
+
+        result.append({
+            "id": s["id"],
+            "student_id": s["student_id"],
+            "name": s["name"],
+            "course": s["course"],
+            "status": status,
+            "amount": amount,
+            "last_date": last_date
+        })
+
+    return result
+
 @app.route("/submit", methods=["POST"])
+@idempotent
 def submit():
     try:
         # Collect form data
@@ -67,31 +609,25 @@ def submit():
         }
 
         # Handle file upload
+        photo = None
         profile_file = request.files.get("profile_pic")
         if profile_file and profile_file.filename:
             # Create unique filename
             file_ext = os.path.splitext(profile_file.filename)[1] or '.jpg'
             unique_filename = f"{uuid.uuid4().hex}{file_ext}"
             storage_path = f"students/{unique_filename}"
-            
-            # Save file temporarily
-            temp_dir = "temp_uploads"
-            os.makedirs(temp_dir, exist_ok=True)
-            temp_path = os.path.join(temp_dir, unique_filename)
-            profile_file.save(temp_path)
-            
+            photo = (profile_file.read(), storage_path, profile_file.mimetype)
+
+        background_upload = photo is not None and PHOTO_UPLOAD_MODE == "background" and data["student_id"]
+        if photo is not None and not background_upload:
             try:
                 # Upload to Supabase Storage
-                public_url = upload_to_storage(temp_path, storage_path)
+                public_url = upload_to_storage(*photo)
                 data["profile_pic_url"] = public_url
                 print(f"Uploaded image to: {public_url}")
             except Exception as upload_error:
                 print(f"Upload failed: {upload_error}")
                 # Continue without image rather than failing completely
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
         
         # Insert data into Supabase table
         response = supabase.table("students").insert(data).execute()
@@ -99,18 +635,33 @@ def submit():
         # Check for errors
         if hasattr(response, 'error') and response.error: # type: ignore
             return jsonify({"success": False, "error": str(response.error)}), 500 # type: ignore
+
+        if background_upload:
+            # Attach the photo once the worker pool has uploaded it
+            if not upload_queue.submit(attach_profile_pic, data["student_id"], *photo):
+                # Queue is full: upload the original inline rather than dropping it
+                try:
+                    public_url = upload_to_storage(*photo)
+                    supabase.table("students").update({"profile_pic_url": public_url}).eq("student_id", data["student_id"]).execute()
+                except Exception as upload_error:
+                    print(f"Upload failed: {upload_error}")
+        elif data.get("profile_pic_url") and data["student_id"]:
+            # Resize and build the thumbnail off the request thread
+            # (skipped when the queue is full; the original stays in place)
+            upload_queue.submit(attach_profile_pic, data["student_id"], *photo, data["profile_pic_url"])
             
-        # After successfully adding student, add them to unpaid fees table
+        # After successfully adding student, add an unpaid fee to the ledger
         if data["student_id"] and data["name"]:
-            unpaid_response = supabase.table("fees_unpaid").insert({
+            unpaid_response = supabase.table(FEE_LEDGER).insert({
                 "student_id": data["student_id"],
-                "name": data["name"],
+                "status": "unpaid",
                 "amount": 0  # Default amount, can be changed later
             }).execute()
             
             if hasattr(unpaid_response, 'error') and unpaid_response.error: # type: ignore
                 print(f"Failed to add student to unpaid fees: {unpaid_response.error}") # type: ignore
         
+        response_cache.invalidate("students", "fees_all", "fees_summary", "fees_unpaid")
         return jsonify({"success": True, "data": response.data}), 201
         
     except Exception as e:
@@ -135,32 +686,234 @@ def health_check():
             "error": str(e)
         }), 500
 
+def parse_student_fields(fields_param: str) -> list:
+    """
+    Parse a comma separated `fields=` projection, always keeping the id cursor column
+    """
+    if not fields_param:
+        return STUDENT_COLUMNS
+
+    fields = [f.strip() for f in fields_param.split(",") if f.strip() in STUDENT_COLUMNS]
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+def sanitize_search_term(term: str) -> str:
+    """
+    Strip characters that have special meaning in PostgREST filter strings
+    """
+    return "".join(c for c in term if c not in ",()*%\\\"").strip()
+
+def students_page_query(client, args) -> tuple:
+    """
+    Build (without executing) the query for one page of GET /students from
+    its query-string args. Returns (query, limit); the query fetches limit + 1
+    rows so split_page can tell whether another page exists.
+    """
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    if limit < 1:
+        limit = DEFAULT_PAGE_SIZE
+    limit = min(limit, MAX_PAGE_SIZE)
+    try:
+        after = int(args["after"]) if args.get("after") else None
+    except ValueError:
+        after = None
+    descending = args.get("order", "asc").lower() == "desc"
+    fields = parse_student_fields(args.get("fields", ""))
+
+    query = client.table("students").select(",".join(fields))
+
+    # Same filters as the filter dropdown in studentdb.html
+    for column in STUDENT_FILTERS:
+        value = args.get(column)
+        if value:
+            query = query.eq(column, value)
+
+    search = sanitize_search_term(args.get("q", ""))
+    if search:
+        query = query.or_(f"name.ilike.{search}*,student_id.ilike.{search}*")
+
+    if after is not None:
+        query = query.lt("id", after) if descending else query.gt("id", after)
+
+    return query.order("id", desc=descending).limit(limit + 1), limit
+
+def split_page(rows: list, limit: int) -> tuple:
+    """
+    Trim the extra row fetched by students_page_query; returns (rows, next_cursor)
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
 @app.route("/students", methods=["GET"])
+@cached_response("students")
 def get_students():
+    """
+    List students one page at a time (keyset pagination on id)
+
+    Query params: limit, after (id cursor), order (asc/desc), fields,
+    course, gender, session, q (prefix search on name and student_id),
+    format=columns for the columnar body.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
     try:
-        # Fetch all students from Supabase
-        response = supabase.table("students").select("*").execute()
-        return jsonify(response.data)
+        query, limit = students_page_query(supabase, request.args)
+        rows, next_cursor = split_page(query.execute().data, limit)
+
+        response = listing_response(rows)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/students/search", methods=["GET"])
+@cached_response("students")
+def search_students():
+    """
+    Ranked, typo-tolerant search over name, father_name, student_id, email and phone
+
+    Query params: q, limit, fields, course, gender, session.
+    Prefix matches on student_id and name rank first for type-ahead.
+    """
+    try:
+        term = request.args.get("q", "").strip()[:MAX_SEARCH_LENGTH]
+        if not term:
+            return jsonify([])
+        try:
+            limit = int(request.args.get("limit", DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        fields = parse_student_fields(request.args.get("fields", ""))
+
+        params = {"p_query": term, "p_limit": limit}
+        for column in STUDENT_FILTERS:
+            params[f"p_{column}"] = request.args.get(column) or None
+
+        rows = supabase.rpc("search_students", params).execute().data
+        return jsonify([{f: row.get(f) for f in fields} for row in rows])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def import_student_batch(batch: list, report: dict) -> None:
+    """
+    Upsert one batch of (row_number, record) pairs on student_id and create
+    unpaid ledger rows for students that have none, in one transaction
+    (see students_import_batch in readme.md)
+    """
+    records = {}
+    for row_number, record in batch:
+        if record["student_id"] in records:
+            add_import_error(report, row_number, record["student_id"], "Duplicate student_id in batch")
+            continue
+        records[record["student_id"]] = (row_number, record)
+    if not records:
+        return
+
+    # Like a PostgREST bulk upsert: columns missing from a row are written as null,
+    # columns missing from the whole batch are left unchanged on existing students
+    present = {column for _, record in records.values() for column in record}
+    columns = [column for column in IMPORT_COLUMNS if column in present]
+    try:
+        counts = supabase.rpc("students_import_batch", {
+            "p_rows": [record for _, record in records.values()],
+            "p_columns": columns
+        }).execute().data
+    except Exception as e:
+        for row_number, record in records.values():
+            add_import_error(report, row_number, record["student_id"], f"Batch failed: {e}")
+        return
+
+    counts = counts[0] if counts else {}
+    report["created"] += counts.get("created") or 0
+    report["updated"] += counts.get("updated") or 0
+
+def add_import_error(report: dict, row_number: int, student_id, message: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_IMPORT_ERRORS:
+        report["errors"].append({"row": row_number, "student_id": student_id, "error": message})
+    else:
+        report["errors_truncated"] = True
+
+@app.route("/students/import", methods=["POST"])
+def import_students():
+    """
+    Bulk import students from a CSV or JSONL upload
+
+    Send the file as multipart field `file` or as the raw request body.
+    Rows are parsed as a stream and upserted on student_id `batch_size` at a time.
+    """
+    try:
+        upload = request.files.get("file")
+        stream = upload.stream if upload else request.stream
+        filename = upload.filename if upload and upload.filename else ""
+
+        fmt = request.args.get("format")
+        if not fmt:
+            if filename.endswith((".jsonl", ".ndjson")) or "ndjson" in (request.mimetype or ""):
+                fmt = "jsonl"
+            else:
+                fmt = "csv"
+        if fmt not in ("csv", "jsonl"):
+            return jsonify({"error": "format must be csv or jsonl"}), 400
+
+        batch_size = request.args.get("batch_size", IMPORT_BATCH_SIZE, type=int)
+        batch_size = max(1, min(batch_size, MAX_IMPORT_BATCH_SIZE))
+
+        report = {"processed": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+        def valid_rows():
+            for row_number, row in iter_rows(stream, fmt):
+                report["processed"] += 1
+                try:
+                    if isinstance(row, ImportRowError):
+                        raise row
+                    yield row_number, validate_student(row)
+                except ImportRowError as e:
+                    student_id = row.get("student_id") if isinstance(row, dict) else None
+                    add_import_error(report, row_number, student_id, str(e))
+
+        for batch in batched(valid_rows(), batch_size):
+            import_student_batch(batch, report)
+
+        if report["created"] or report["updated"]:
+            response_cache.invalidate("students", "fees_all", "fees_summary", "fees_unpaid")
+
+        return jsonify({"success": True, **report})
+
+    except Exception as e:
+        app.logger.exception("Error importing students")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route("/students/<student_id>", methods=["DELETE"])
 def delete_student(student_id):
+    """
+    Delete a student by row id (the `id` column, not `student_id`).
+    Their fee_ledger rows are removed by the foreign key's ON DELETE CASCADE
+    in the same statement.
+    """
     try:
-        # Delete student from Supabase
         response = supabase.table("students").delete().eq("id", student_id).execute()
+        if not response.data:
+            return jsonify({"error": "Student not found"}), 404
         
-        # Also remove from all fees tables
-        supabase.table("fees_unpaid").delete().eq("student_id", student_id).execute()
-        supabase.table("fees_paid").delete().eq("student_id", student_id).execute()
-        supabase.table("fees_overdue").delete().eq("student_id", student_id).execute()
-        
+        response_cache.invalidate("students", "fees_all", "fees_summary", "fees_paid", "fees_unpaid", "fees_overdue")
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 @app.route("/students/<student_id>", methods=["PUT"])
 def update_student(student_id):
+    """
+    Update a student by row id. Fee listings pick up a new name at read time
+    and a changed student_id through ON UPDATE CASCADE, so this is one round trip.
+    """
     try:
         # Get JSON data from request
         data = request.get_json()
@@ -170,25 +923,26 @@ def update_student(student_id):
         
         if hasattr(response, 'error') and response.error:   # pyright: ignore[reportAttributeAccessIssue]
             return jsonify({"error": str(response.error)}), 500  # pyright: ignore[reportAttributeAccessIssue]
+        if not response.data:
+            return jsonify({"error": "Student not found"}), 404
             
-        # If student name was updated, update in all fees tables as well
-        if "name" in data:
-            supabase.table("fees_unpaid").update({"name": data["name"]}).eq("student_id", student_id).execute()
-            supabase.table("fees_paid").update({"name": data["name"]}).eq("student_id", student_id).execute()
-            supabase.table("fees_overdue").update({"name": data["name"]}).eq("student_id", student_id).execute()
+        # Cached fee listings embed the name and student_id
+        if "name" in data or "student_id" in data:
+            response_cache.invalidate("fees_paid", "fees_unpaid", "fees_overdue")
             
+        response_cache.invalidate("students", "fees_all", "fees_summary")
         return jsonify({"success": True, "data": response.data})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # ======================
-# Fees Management Routes (Properly separated tables)
+# Fees Management Routes (single fee_ledger table)
 # ======================
 
 @app.route("/fees/unpaid", methods=["GET"])
+@cached_response("fees_unpaid")
 def get_fees_unpaid():
-    response = supabase.table("fees_unpaid").select("*").execute()
-    return jsonify(response.data)
+    return jsonify(fetch_fees_by_status("unpaid"))
 
 # @app.route("/fees/paid", methods=["GET"])
 # def get_fees_paid():
@@ -196,50 +950,43 @@ def get_fees_unpaid():
 #     return jsonify(response.data)
 
 @app.route("/fees/overdue", methods=["GET"])
+@cached_response("fees_overdue")
 def get_fees_overdue():
-    response = supabase.table("fees_overdue").select("*").execute()
-    return jsonify(response.data)
+    return jsonify(fetch_fees_by_status("overdue"))
+
+def fee_transition_error(e: APIError):
+    """
+    Map errors raised by the fee_* database functions to API responses
+    """
+    if e.code == "P0002":
+        return jsonify({"error": "Student not found"}), 404
+    if e.code == "22023":
+        return jsonify({"error": e.message}), 400
+    return jsonify({"error": str(e)}), 500
 
 @app.route("/fees/pay", methods=["POST"])
+@idempotent
 def mark_fee_paid():
     """Move student from unpaid/overdue → paid"""
     try:
         data = request.get_json()
         student_id = data["student_id"]
-        amount = data["amount"]
-        
-        # Get student name
-        student_response = supabase.table("students").select("name").eq("student_id", student_id).execute()
-        if not student_response.data:
-            return jsonify({"error": "Student not found"}), 404
-            
-        student_name = student_response.data[0]["name"]
-        
-        # Check if student exists in unpaid table
-        unpaid_response = supabase.table("fees_unpaid").select("*").eq("student_id", student_id).execute()
-        if unpaid_response.data:
-            # Remove from unpaid
-            supabase.table("fees_unpaid").delete().eq("student_id", student_id).execute()
-        
-        # Check if student exists in overdue table
-        overdue_response = supabase.table("fees_overdue").select("*").eq("student_id", student_id).execute()
-        if overdue_response.data:
-            # Remove from overdue
-            supabase.table("fees_overdue").delete().eq("student_id", student_id).execute()
+        amount = parse_amount(data["amount"])
         
-        # Insert into paid with current date
-        paid_response = supabase.table("fees_paid").insert({
-            "student_id": student_id,
-            "name": student_name,
-            "amount": amount,
-            "date": datetime.now().strftime("%Y-%m-%d")
+        # Single transaction in Postgres (see fee_mark_paid in readme.md)
+        supabase.rpc("fee_mark_paid", {
+            "p_student_id": student_id,
+            "p_amount": amount,
+            "p_date": datetime.now().strftime("%Y-%m-%d")
         }).execute()
-        
-        if hasattr(paid_response, 'error') and paid_response.error: # type: ignore
-            return jsonify({"error": str(paid_response.error)}), 500 # type: ignore
+        response_cache.invalidate("fees_all", "fees_summary", "fees_paid", "fees_unpaid", "fees_overdue")
             
         return jsonify({"success": True})
         
+    except APIError as e:
+        return fee_transition_error(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -249,120 +996,149 @@ def move_to_overdue():
     try:
         data = request.get_json()
         student_id = data["student_id"]
-        amount = data["amount"]
-        
-        # Get student name
-        student_response = supabase.table("students").select("name").eq("student_id", student_id).execute()
-        if not student_response.data:
-            return jsonify({"error": "Student not found"}), 404
-            
-        student_name = student_response.data[0]["name"]
+        amount = parse_amount(data["amount"])
         
-        # Remove from unpaid
-        supabase.table("fees_unpaid").delete().eq("student_id", student_id).execute()
-        
-        # Insert into overdue
-        overdue_response = supabase.table("fees_overdue").insert({
-            "student_id": student_id,
-            "name": student_name,
-            "amount": amount
+        # Single transaction in Postgres (see fee_move_overdue in readme.md)
+        supabase.rpc("fee_move_overdue", {
+            "p_student_id": student_id,
+            "p_amount": amount
         }).execute()
-        
-        if hasattr(overdue_response, 'error') and overdue_response.error: # type: ignore
-            return jsonify({"error": str(overdue_response.error)}), 500 # type: ignore
+        response_cache.invalidate("fees_all", "fees_summary", "fees_unpaid", "fees_overdue")
             
         return jsonify({"success": True})
         
+    except APIError as e:
+        return fee_transition_error(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def sweep_overdue_fees() -> dict:
+    """
+    Mark unpaid fees whose due date has passed as overdue. Every unpaid fee gets
+    a due date when it is created (the fee_ledger.due_date default in readme.md).
+
+    A single set-based UPDATE on the ledger, so the sweep is atomic and costs
+    one round trip however many fees move.
+    Safe to call outside a request (e.g. `flask --app app sweep-overdue`).
+    """
+    started = time.perf_counter()
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    response = supabase.table(FEE_LEDGER).update(
+        {"status": "overdue"}, count=CountMethod.exact, returning=ReturnMethod.minimal
+    ).eq("status", "unpaid").lt("due_date", today).execute()
+    moved_count = response.count or 0
+
+    if moved_count:
+        response_cache.invalidate("fees_all", "fees_summary", "fees_unpaid", "fees_overdue")
+
+    return {
+        "moved": moved_count,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
 @app.route("/fees/check_overdue", methods=["POST"])
+@admin_required
 def check_overdue_fees():
-    """Check for unpaid fees that are over 30 days old and move them to overdue"""
+    """
+    Run the overdue sweep now (it also runs on a schedule; see the jobs section).
+    Goes through the job lock so it never overlaps a scheduled run.
+    """
     try:
-        # Get all unpaid fees
-        unpaid_response = supabase.table("fees_unpaid").select("*").execute()
-        unpaid_fees = unpaid_response.data
-        
-        # Current date
-        current_date = datetime.now()
-        moved_count = 0
-        
-        for fee in unpaid_fees:
-            # Check if fee has a date field and is over 30 days old
-            if "date" in fee and fee["date"]:
-                try:
-                    fee_date = datetime.strptime(fee["date"], "%Y-%m-%d")
-                    if (current_date - fee_date).days > 30:
-                        # Move to overdue
-                        move_data = {
-                            "student_id": fee["student_id"],
-                            "amount": fee["amount"]
-                        }
-                        # Call the move_to_overdue function
-                        move_response = supabase.table("fees_overdue").insert({
-                            "student_id": fee["student_id"],
-                            "name": fee.get("name", "Unknown"),
-                            "amount": fee["amount"]
-                        }).execute()
-                        
-                        if not (hasattr(move_response, 'error') and move_response.error): # type: ignore
-                            # Remove from unpaid if successfully moved to overdue
-                            supabase.table("fees_unpaid").delete().eq("student_id", fee["student_id"]).execute()
-                            moved_count += 1
-                except ValueError:
-                    # Skip if date format is invalid
-                    continue
-        
-        return jsonify({"success": True, "message": f"Moved {moved_count} fees to overdue"})
-        
+        result = job_scheduler.run("overdue_sweep")
+        if result["status"] != "ok":
+            return jsonify({"error": result["error"]}), 500
+        return jsonify({
+            "success": True,
+            "message": f"Moved {result['rows_affected']} fees to overdue",
+            "moved": result["rows_affected"],
+            "duration_ms": result["duration_ms"]
+        })
+
+    except JobBusyError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.cli.command("sweep-overdue")
+def sweep_overdue_command():
+    """Move stale unpaid fees to overdue without going through HTTP"""
+    result = sweep_overdue_fees()
+    print(f"Moved {result['moved']} unpaid fees to overdue ({result['duration_ms']} ms)")
+
+def summary_bucket() -> dict:
+    return {status: {"count": 0, "total": 0.0} for status in FEE_STATUSES}
+
+def add_to_bucket(bucket: dict, row: dict) -> None:
+    bucket[row["status"]]["count"] += row["entries"]
+    bucket[row["status"]]["total"] = round(bucket[row["status"]]["total"] + float(row["total"] or 0), 2)
+
+def build_fee_summary(rows: list, months: list) -> dict:
+    """
+    Roll fee_summary rows (status, course, session) up into the dashboard totals
+    """
+    summary = {"by_status": summary_bucket(), "by_course": {}, "by_session": {}}
+    for row in rows:
+        if not row["entries"]:
+            continue
+        add_to_bucket(summary["by_status"], row)
+        add_to_bucket(summary["by_course"].setdefault(row["course"], summary_bucket()), row)
+        add_to_bucket(summary["by_session"].setdefault(row["session"], summary_bucket()), row)
+
+    summary["monthly_collections"] = [
+        {"month": m["month"][:7], "count": m["entries"], "total": float(m["total"] or 0)}
+        for m in months if m["entries"]
+    ]
+    return summary
+
+@app.route("/fees/summary", methods=["GET"])
+@cached_response("fees_summary")
+def get_fees_summary():
+    """
+    Fee counts and sums per status, course and session, plus paid collections per month.
+    Reads the trigger-maintained aggregate tables, so the cost does not grow with students.
+    """
+    try:
+        rows = supabase.table(FEE_SUMMARY).select("*").execute().data
+        months = supabase.table(FEE_COLLECTIONS).select("*").order("month").execute().data
+        return jsonify(build_fee_summary(rows, months))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def rebuild_fee_summary() -> int:
+    """
+    Recompute the fee_summary tables; returns the number of ledger rows aggregated
+    """
+    rows = supabase.rpc("fee_summary_rebuild").execute().data
+    response_cache.invalidate("fees_summary")
+    return rows or 0
+
+@app.cli.command("rebuild-fee-summary")
+def rebuild_fee_summary_command():
+    """Recompute the dashboard aggregates from the fee ledger (reconciliation)"""
+    started = time.perf_counter()
+    rows = rebuild_fee_summary()
+    print(f"Rebuilt fee summary from {rows} ledger rows ({round((time.perf_counter() - started) * 1000, 1)} ms)")
+
 @app.route("/fees/all", methods=["GET"])
+@cached_response("fees_all")
 def get_all_fees_status():
     try:
         # Get all students
         students = supabase.table("students").select("*").execute().data
 
-        # Fetch fees data from all tables
-        paid = supabase.table("fees_paid").select("*").execute().data
-        unpaid = supabase.table("fees_unpaid").select("*").execute().data
-        overdue = supabase.table("fees_overdue").select("*").execute().data
-
-        result = []
-        for s in students:
-            status = "unpaid"  # Default status
-            amount = None
-            last_date = None
-
-            # Check if student is in any fees table (priority: overdue > paid > unpaid)
-            overdue_entry = next((f for f in overdue if f["student_id"] == s["student_id"]), None)
-            paid_entry = next((f for f in paid if f["student_id"] == s["student_id"]), None)
-            unpaid_entry = next((f for f in unpaid if f["student_id"] == s["student_id"]), None)
-            
-            if overdue_entry:
-                status = "overdue"
-                amount = overdue_entry.get("amount")
-            elif paid_entry:
-                status = "paid"
-                amount = paid_entry.get("amount")
-                last_date = paid_entry.get("date")
-            elif unpaid_entry:
-                status = "unpaid"
-                amount = unpaid_entry.get("amount")
-
-            result.append({
-                "id": s["id"],
-                "student_id": s["student_id"],
-                "name": s["name"],
-                "course": s["course"],
-                "status": status,
-                "amount": amount,
-                "last_date": last_date
-            })
+        # Fetch all fees from the ledger in one query
+        paid, unpaid, overdue = fetch_fees()
+
+        result = resolve_fee_status(students, paid, unpaid, overdue)
+
+        # Optionally attach each student's latest amount from the rows already fetched
+        if "latest_amount" in request.args.get("include", "").split(","):
+            attach_latest_amounts(result, paid, unpaid, overdue)
 
-        return jsonify(result)
+        return listing_response(result)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -373,150 +1149,200 @@ def add_fee_entry():
     try:
         data = request.get_json()
         student_id = data.get("student_id")
-        amount = data.get("amount")
+        amount = parse_amount(data.get("amount"))
         status = data.get("status", "unpaid")
         date = data.get("date")
         
-        # Get student name
-        student_response = supabase.table("students").select("name").eq("student_id", student_id).execute()
-        if not student_response.data:
-            return jsonify({"error": "Student not found"}), 404
-            
-        student_name = student_response.data[0]["name"]
-        
-        # Remove from other tables first to avoid duplicates
-        if status != "unpaid":
-            supabase.table("fees_unpaid").delete().eq("student_id", student_id).execute()
-        if status != "paid":
-            supabase.table("fees_paid").delete().eq("student_id", student_id).execute()
-        if status != "overdue":
-            supabase.table("fees_overdue").delete().eq("student_id", student_id).execute()
-        
-        # Add to appropriate table
-        if status == "paid":
-            response = supabase.table("fees_paid").insert({
-                "student_id": student_id,
-                "name": student_name,
-                "amount": amount,
-                "date": date or datetime.now().strftime("%Y-%m-%d")
-            }).execute()
-        elif status == "unpaid":
-            # Don't include date for unpaid fees (as fees_unpaid table doesn't have date column)
-            response = supabase.table("fees_unpaid").insert({
-                "student_id": student_id,
-                "name": student_name,
-                "amount": amount
-            }).execute()
-        elif status == "overdue":
-            response = supabase.table("fees_overdue").insert({
-                "student_id": student_id,
-                "name": student_name,
-                "amount": amount
-            }).execute()
-        else:
+        if status not in FEE_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
-
-        if hasattr(response, 'error') and response.error: # type: ignore
-            return jsonify({"error": str(response.error)}), 500 # type: ignore
+        
+        # Single transaction in Postgres (see fee_add_entry in readme.md).
+        # The date is only stored for paid fees.
+        supabase.rpc("fee_add_entry", {
+            "p_student_id": student_id,
+            "p_amount": amount,
+            "p_status": status,
+            "p_date": date or datetime.now().strftime("%Y-%m-%d")
+        }).execute()
+        response_cache.invalidate("fees_all", "fees_summary", "fees_paid", "fees_unpaid", "fees_overdue")
             
         return jsonify({"success": True})
         
+    except APIError as e:
+        return fee_transition_error(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/fees/paid", methods=["GET"])
+@cached_response("fees_paid")
 def get_fees_paid():
     """Get all paid fees with proper sorting"""
     try:
         # Get all paid fees
-        response = supabase.table("fees_paid").select("*").execute()
-        paid_fees = response.data
+        paid_fees = fetch_fees_by_status("paid")
         
         # Sort by date descending (most recent first)
-        paid_fees.sort(key=lambda x: x.get('date', ''), reverse=True)
+        paid_fees.sort(key=lambda x: x.get('date') or '', reverse=True)
         
-        return jsonify(paid_fees)
+        return listing_response(paid_fees)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def attach_latest_amounts(result: list, paid: list, unpaid: list, overdue: list) -> None:
+    """
+    Replace each /fees/all entry's amount with the most recent amount in its history
+    """
+    histories = build_history_index(paid, unpaid, overdue)
+    for entry in result:
+        history = histories.get(entry["student_id"])
+        if history:
+            entry["amount"] = history[0]["amount"]
+
+def history_batch_result(student_ids: list, paid: list, unpaid: list, overdue: list) -> dict:
+    """
+    Shape the POST /fees/history/batch response
+    """
+    histories = build_history_index(paid, unpaid, overdue)
+    result = {}
+    for sid in student_ids:
+        history = histories.get(sid, [])
+        result[sid] = {
+            "latest_amount": history[0]["amount"] if history else None,
+            "history": history
+        }
+    return result
+
+def build_payment_history(paid: list, unpaid: list, overdue: list) -> list:
+    """
+    Combine rows from all fees tables into a single history, most recent first
+    """
+    history = []
+
+    # Add paid payments
+    for payment in paid:
+        history.append({
+            "payment_id": payment.get("id"),
+            "student_id": payment.get("student_id"),
+            "name": payment.get("name"),
+            "amount": payment.get("amount"),
+            "date": payment.get("date"),
+            "type": "paid"
+        })
+
+    # Add unpaid payments
+    for payment in unpaid:
+        history.append({
+            "payment_id": payment.get("id"),
+            "student_id": payment.get("student_id"),
+            "name": payment.get("name"),
+            "amount": payment.get("amount"),
+            "date": None,
+            "type": "unpaid"
+        })
+
+    # Add overdue payments
+    for payment in overdue:
+        history.append({
+            "payment_id": payment.get("id"),
+            "student_id": payment.get("student_id"),
+            "name": payment.get("name"),
+            "amount": payment.get("amount"),
+            "date": None,
+            "type": "overdue"
+        })
+
+    # Sort by date (most recent first, undated entries last)
+    history.sort(key=lambda x: x.get('date') or '', reverse=True)
+
+    return history
+
+def group_by_student(rows: list) -> dict:
+    """
+    Map student_id -> all fee rows for that student (single pass)
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.get("student_id"), []).append(row)
+    return groups
+
+def build_history_index(paid: list, unpaid: list, overdue: list) -> dict:
+    """
+    Build the payment history of every student present in the given rows
+    """
+    paid_groups = group_by_student(paid)
+    unpaid_groups = group_by_student(unpaid)
+    overdue_groups = group_by_student(overdue)
+
+    student_ids = set(paid_groups) | set(unpaid_groups) | set(overdue_groups)
+    return {
+        sid: build_payment_history(
+            paid_groups.get(sid, []),
+            unpaid_groups.get(sid, []),
+            overdue_groups.get(sid, [])
+        )
+        for sid in student_ids
+    }
+
 @app.route("/fees/history/<student_id>", methods=["GET"])
 def get_payment_history(student_id):
     """Get payment history for a specific student"""
     try:
-        # Get all payments for the student from all tables
-        paid = supabase.table("fees_paid").select("*").eq("student_id", student_id).execute().data
-        unpaid = supabase.table("fees_unpaid").select("*").eq("student_id", student_id).execute().data
-        overdue = supabase.table("fees_overdue").select("*").eq("student_id", student_id).execute().data
-        
-        # Combine all payments
-        history = []
-        
-        # Add paid payments
-        for payment in paid:
-            history.append({
-                "payment_id": payment.get("id"),
-                "student_id": payment.get("student_id"),
-                "name": payment.get("name"),
-                "amount": payment.get("amount"),
-                "date": payment.get("date"),
-                "type": "paid"
-            })
-        
-        # Add unpaid payments
-        for payment in unpaid:
-            history.append({
-                "payment_id": payment.get("id"),
-                "student_id": payment.get("student_id"),
-                "name": payment.get("name"),
-                "amount": payment.get("amount"),
-                "date": None,
-                "type": "unpaid"
-            })
-        
-        # Add overdue payments
-        for payment in overdue:
-            history.append({
-                "payment_id": payment.get("id"),
-                "student_id": payment.get("student_id"),
-                "name": payment.get("name"),
-                "amount": payment.get("amount"),
-                "date": None,
-                "type": "overdue"
-            })
-        
-        # Sort by date (most recent first)
-        history.sort(key=lambda x: x.get('date', ''), reverse=True)
-        
+        # Get all payments for the student from the ledger
+        paid, unpaid, overdue = fetch_fees(student_id=student_id)
+
+        history = build_payment_history(paid, unpaid, overdue)
+
         return jsonify(history)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/fees/history/batch", methods=["POST"])
+def get_payment_history_batch():
+    """
+    Get payment history and latest amount for many students in one request
+    (at most MAX_HISTORY_BATCH_SIZE student_ids)
+    """
+    try:
+        data = request.get_json() or {}
+        student_ids = [sid for sid in data.get("student_ids", []) if sid]
+        if not student_ids:
+            return jsonify({})
+        if len(student_ids) > MAX_HISTORY_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_HISTORY_BATCH_SIZE} student_ids per request"}), 400
+
+        # One ledger query for all requested students
+        paid, unpaid, overdue = fetch_fees(student_ids=student_ids)
+
+        return jsonify(history_batch_result(student_ids, paid, unpaid, overdue))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/fees/update/<payment_id>", methods=["PUT"])
 def update_payment(payment_id):
     """Update a payment record"""
     try:
         data = request.get_json()
-        amount = data.get("amount")
+        amount = parse_amount(data.get("amount"))
         date = data.get("date")
         
-        # Get the existing payment
-        payment_response = supabase.table("fees_paid").select("*").eq("id", payment_id).execute()
-        if not payment_response.data:
-            return jsonify({"error": "Payment not found"}), 404
-            
-        payment = payment_response.data[0]
-        
-        # Update the payment
-        response = supabase.table("fees_paid").update({
+        # Update the payment (only paid ledger rows are payments)
+        response = supabase.table(FEE_LEDGER).update({
             "amount": amount,
-            "date": date
-        }).eq("id", payment_id).execute()
+            "paid_date": date
+        }).eq("id", payment_id).eq("status", "paid").execute()
         
         if hasattr(response, 'error') and response.error: # type: ignore
             return jsonify({"error": str(response.error)}), 500 # type: ignore
+        if not response.data:
+            return jsonify({"error": "Payment not found"}), 404
+        response_cache.invalidate("fees_all", "fees_summary", "fees_paid")
             
         return jsonify({"success": True})
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -525,7 +1351,8 @@ def delete_payment(payment_id):
     """Delete a payment record"""
     try:
         # Delete the payment
-        response = supabase.table("fees_paid").delete().eq("id", payment_id).execute()
+        response = supabase.table(FEE_LEDGER).delete().eq("id", payment_id).eq("status", "paid").execute()
+        response_cache.invalidate("fees_all", "fees_summary", "fees_paid")
         
         if hasattr(response, 'error') and response.error: # type: ignore
             return jsonify({"error": str(response.error)}), 500 # type: ignore
@@ -535,5 +1362,272 @@ def delete_payment(payment_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def migrate_legacy_fee_table(table: str, status: str, page_size: int = MIGRATION_PAGE_SIZE) -> dict:
+    """
+    Page through one legacy fees table and upsert its rows into the ledger.
+    Rows are keyed by (legacy_table, legacy_id), so the migration can be re-run safely.
+    """
+    result = {"copied": 0, "skipped": 0, "invalid_amounts": 0}
+    last_id = 0
+    while True:
+        rows = supabase.table(table).select("*").gt("id", last_id).order("id").limit(page_size).execute().data
+        if not rows:
+            return result
+
+        # The ledger's foreign key rejects fees for students that no longer exist
+        known_students = {
+            student["student_id"] for student in
+            supabase.table("students").select("student_id")
+            .in_("student_id", [row["student_id"] for row in rows if row.get("student_id")]).execute().data
+        }
+
+        entries = []
+        for row in rows:
+            if row.get("student_id") not in known_students:
+                result["skipped"] += 1
+                continue
+            try:
+                amount = parse_amount(row.get("amount"))
+            except ValueError:
+                amount = None
+                result["invalid_amounts"] += 1
+            entry = {
+                "student_id": row.get("student_id"),
+                "status": status,
+                "amount": amount,
+                "paid_date": row.get("date") if status == "paid" else None,
+                "legacy_table": table,
+                "legacy_id": row["id"],
+            }
+            # Legacy unpaid/overdue rows have no date: leave due_date out so the
+            # column default (created + 30 days) applies instead of null
+            if status == "paid":
+                entry["due_date"] = None
+            elif row.get("date"):
+                entry["due_date"] = row["date"]
+            entries.append(entry)
+
+        if entries:
+            supabase.table(FEE_LEDGER).upsert(
+                entries, on_conflict="legacy_table,legacy_id", ignore_duplicates=True,
+                returning=ReturnMethod.minimal, default_to_null=False
+            ).execute()
+        result["copied"] += len(entries)
+        last_id = rows[-1]["id"]
+
+@app.cli.command("migrate-fee-ledger")
+def migrate_fee_ledger_command():
+    """Copy rows from fees_paid / fees_unpaid / fees_overdue into fee_ledger"""
+    for table, status in LEGACY_FEE_TABLES.items():
+        result = migrate_legacy_fee_table(table, status)
+        print(f"{table}: copied {result['copied']} rows, skipped {result['skipped']} without a matching student, "
+              f"{result['invalid_amounts']} amounts could not be parsed and were left empty")
+    response_cache.clear()
+
+@app.route("/uploads/stats", methods=["GET"])
+def get_upload_stats():
+    """Background photo upload queue counters"""
+    return jsonify(upload_queue.stats())
+
+@app.route("/client/stats", methods=["GET"])
+def get_client_stats():
+    """Supabase connection pool, retry and circuit breaker counters"""
+    return jsonify(supabase_transport.stats())
+
+@app.route("/idempotency/stats", methods=["GET"])
+def get_idempotency_stats():
+    """Idempotency-Key store counters"""
+    return jsonify(idempotency_store.stats())
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """Response cache hit/miss counters"""
+    return jsonify(response_cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request and Supabase call metrics in Prometheus text format (per process)"""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+# ======================
+# Maintenance jobs
+# ======================
+
+def parse_storage_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def storage_path_from_url(url: str) -> str:
+    """
+    Object path inside BUCKET for a public Storage URL, whichever host or
+    SUPABASE_URL it was built with (None for other URLs)
+    """
+    marker = f"/storage/v1/object/public/{BUCKET}/"
+    if not url or marker not in url:
+        return None
+    return url.split(marker, 1)[1].split("?", 1)[0]
+
+def referenced_photo_paths() -> set:
+    """
+    Storage paths of every photo and thumbnail a student row points to
+    """
+    paths = set()
+    for page in iter_student_pages(["id", "profile_pic_url", "profile_thumb_url"]):
+        for row in page:
+            for column in ("profile_pic_url", "profile_thumb_url"):
+                path = storage_path_from_url(row.get(column))
+                if path:
+                    paths.add(path)
+    return paths
+
+def cleanup_orphaned_photos() -> int:
+    """
+    Remove profile photos under students/ that no student row references
+    (failed or superseded uploads, deleted students). Returns the number removed.
+
+    Rows are matched on the storage path, not the full URL, so a different
+    SUPABASE_URL (internal hostname, moved host, trailing slash) cannot make
+    referenced photos look orphaned.
+    """
+    bucket = supabase.storage.from_(BUCKET)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=ORPHAN_PHOTO_GRACE_HOURS)
+    # Read before listing: photos referenced later than this are inside the grace period
+    referenced = referenced_photo_paths()
+    removed = 0
+    offset = 0
+    while True:
+        objects = bucket.list("students", {
+            "limit": STORAGE_LIST_PAGE_SIZE,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"}
+        })
+        # Folder placeholders have no id
+        orphans = [
+            f"students/{o['name']}" for o in objects
+            if o.get("id") and o.get("created_at") and parse_storage_timestamp(o["created_at"]) < cutoff
+            and f"students/{o['name']}" not in referenced
+        ]
+        if orphans:
+            bucket.remove(orphans)
+            removed += len(orphans)
+
+        if len(objects) < STORAGE_LIST_PAGE_SIZE:
+            return removed
+        # Removed objects no longer count towards the offset
+        offset += len(objects) - len(orphans)
+
+job_scheduler.register("overdue_sweep", lambda: sweep_overdue_fees()["moved"], JOB_OVERDUE_SWEEP_INTERVAL)
+job_scheduler.register("orphaned_photos", cleanup_orphaned_photos, JOB_ORPHANED_PHOTOS_INTERVAL)
+job_scheduler.register("fee_summary_rebuild", rebuild_fee_summary, JOB_FEE_SUMMARY_INTERVAL)
+job_scheduler.register("idempotency_cleanup", idempotency_store.cleanup, JOB_IDEMPOTENCY_CLEANUP_INTERVAL)
+
+def start_job_scheduler() -> bool:
+    """
+    Start the in-process scheduler if enabled. Call it in each serving process
+    after any fork (see gunicorn.conf.py and asgi.py).
+    """
+    return JOBS_ENABLED and job_scheduler.start()
+
+@app.route("/jobs", methods=["GET"])
+def get_jobs():
+    """Job intervals, this process's last results and the most recent recorded runs"""
+    try:
+        recent = job_scheduler.store.recent_runs()
+    except Exception as e:
+        recent = {"error": str(e)}
+    return jsonify({**job_scheduler.stats(), "recent_runs": recent})
+
+@app.route("/jobs/<name>/run", methods=["POST"])
+@admin_required
+def run_job(name):
+    """Manually run a maintenance job now"""
+    if name not in job_scheduler.jobs:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        result = job_scheduler.run(name)
+        return jsonify(result), 200 if result["status"] == "ok" else 500
+    except JobBusyError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.cli.command("run-jobs")
+def run_jobs_command():
+    """Run the job scheduler in the foreground (sidecar mode; set JOBS_ENABLED=0 on the web workers)"""
+    logging.basicConfig(level=logging.INFO)
+    job_scheduler.run_forever()
+
+# ======================
+# Streaming exports
+# ======================
+
+def iter_student_pages(columns: list, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yield the students table one page at a time (keyset on id)
+    """
+    last_id = None
+    while True:
+        query = supabase.table("students").select(",".join(columns))
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+def iter_fee_status_pages(page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Yield students joined with their fee status, one page at a time.
+    Each page embeds the students' ledger rows (through the fee_ledger.student_id
+    foreign key), so it is a single query with a short URL.
+    """
+    columns = ["id", "student_id", "name", "course", f"{FEE_LEDGER}(id,status,amount,paid_date)"]
+    for students in iter_student_pages(columns, page_size):
+        # Same shape and order (by ledger id) as rows read with ledger_query
+        rows = [
+            {**fee, "student_id": s["student_id"], "students": {"name": s["name"]}}
+            for s in students for fee in sorted(s[FEE_LEDGER] or [], key=lambda fee: fee["id"])
+        ]
+        yield resolve_fee_status(students, *split_fees(rows))
+
+def export_response(name: str, pages, columns: list):
+    """
+    Stream pages as CSV or NDJSON (?format=), optionally gzipped (?compress=gzip)
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"{name}-{datetime.now().strftime('%Y%m%d')}{extension}"
+
+    chunks = encode_rows(pages, fmt, columns)
+    if request.args.get("compress") == "gzip":
+        chunks = gzip_chunks(chunks)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route("/export/students", methods=["GET"])
+def export_students():
+    """Stream every student as CSV/NDJSON"""
+    return export_response("students", iter_student_pages(STUDENT_COLUMNS), STUDENT_COLUMNS)
+
+@app.route("/export/fees", methods=["GET"])
+def export_fees():
+    """Stream every student with their resolved fee status as CSV/NDJSON"""
+    return export_response("fees", iter_fee_status_pages(), FEE_EXPORT_COLUMNS)
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Development server only; see wsgi.py and gunicorn.conf.py for production
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    # With the reloader, only the child process that serves requests runs jobs
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_job_scheduler()
+    app.run(host="0.0.0.0", port=5000, debug=debug)
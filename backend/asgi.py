@@ -0,0 +1,254 @@
+"""
+Async (ASGI) serving mode.
+
+The read routes that fan out to several independent Supabase queries are
+served natively with the async Supabase client and run those queries
+concurrently. Every other route is handled by the Flask app from app.py
+on a pool of ASGI_FLASK_THREADS threads (default 40) per worker; app.py
+stays a supported entry point on its own.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+With more than one worker set CACHE_SHARED_INVALIDATION=1 (see app.py);
+`python asgi.py` does this itself when ASGI_WORKERS > 1.
+"""
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.http import parse_accept_header
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from starlette.concurrency import run_in_threadpool
+
+from cache import make_etag
+from compression import choose_encoding, compress
+from client import create_pooled_async_client
+import app as flask_module
+
+flask_app = flask_module.app
+response_cache = flask_module.response_cache
+
+# Threads per worker for the routes served by the Flask app (see FlaskThreadPool)
+FLASK_THREADS = int(os.environ.get("ASGI_FLASK_THREADS", 40))
+flask_executor = ThreadPoolExecutor(max_workers=FLASK_THREADS, thread_name_prefix="flask")
+
+# Set in lifespan, once the event loop is running
+async_supabase = None
+async_transport = None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global async_supabase, async_transport
+    # Share the breaker so both clients agree on whether Supabase is healthy
+    async_supabase, async_transport = await create_pooled_async_client(
+        flask_module.SUPABASE_URL, flask_module.SUPABASE_KEY,
+        breaker=flask_module.supabase_transport.breaker,
+    )
+    flask_module.start_job_scheduler()
+    yield
+    flask_module.job_scheduler.stop()
+    await async_transport.aclose()
+
+
+def json_body(data) -> bytes:
+    """
+    Serialize like Flask's jsonify, so cached bodies and ETags are the same
+    whichever entry point produced them
+    """
+    return flask_app.json.response(data).get_data()
+
+
+def listing_body(request: Request, rows: list) -> bytes:
+    """
+    Same as app.listing_response: ?format=columns opts into the columnar form
+    """
+    if request.query_params.get("format") == "columns":
+        return json_body(flask_module.to_columns(rows))
+    return json_body(rows)
+
+
+def cached_json(namespace: str):
+    """
+    Async counterpart of app.cached_response. Shares the same cache and keys
+    (Flask's request.full_path), so writes through Flask invalidate these too.
+    """
+    def decorator(view):
+        async def wrapper(request: Request):
+            key = f"{request.url.path}?{request.url.query}"
+            if response_cache.shared is None:
+                entry, generation = response_cache.lookup(namespace, key)
+            else:
+                # Reads the shared generation through the sync client; keep it off the event loop
+                entry, generation = await run_in_threadpool(response_cache.lookup, namespace, key)
+
+            if entry is None:
+                response = await view(request)
+                if response.status_code != 200:
+                    return response
+
+                body = response.body
+                entry = {
+                    "body": body,
+                    "etag": make_etag(body),
+                    "headers": {h: response.headers[h] for h in flask_module.CACHED_HEADERS if h in response.headers}
+                }
+                response_cache.set(namespace, key, entry, generation=generation)
+
+            etag = f'"{entry["etag"]}"'
+            # Weak comparison, like the Flask side: compressed variants carry W/ ETags
+            if_none_match = request.headers.get("if-none-match", "")
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            if if_none_match == "*" or etag in tags:
+                return Response(status_code=304, headers={"ETag": etag})
+
+            body = entry["body"]
+            headers = {**entry["headers"], "ETag": etag, "Vary": "Accept-Encoding"}
+            encoding = choose_encoding(parse_accept_header(request.headers.get("accept-encoding")))
+            if encoding and len(body) >= flask_module.COMPRESS_MIN_SIZE:
+                variants = entry.setdefault("encoded", {})
+                if encoding not in variants:
+                    variants[encoding] = compress(body, encoding)
+                body = variants[encoding]
+                headers.update({"Content-Encoding": encoding, "ETag": f"W/{etag}"})
+            return Response(body, media_type="application/json", headers=headers)
+        return wrapper
+    return decorator
+
+
+class FlaskThreadPoolInstance(WsgiToAsgiInstance):
+    # WsgiToAsgi runs the WSGI app thread-sensitively, i.e. every request on one
+    # shared thread; these run side by side on flask_executor instead
+    run_wsgi_app = SyncToAsync(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False,
+                               executor=flask_executor)
+
+
+class FlaskThreadPool(WsgiToAsgi):
+    """
+    Serve a WSGI app from ASGI with up to FLASK_THREADS requests in flight at once
+    """
+
+    async def __call__(self, scope, receive, send):
+        await FlaskThreadPoolInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+def error_response(e: Exception, status: int = 500) -> JSONResponse:
+    return JSONResponse({"error": str(e)}, status_code=status)
+
+
+@cached_json("students")
+async def get_students(request: Request):
+    """Async GET /students (same params and X-Next-Cursor header as app.get_students)"""
+    try:
+        query, limit = flask_module.students_page_query(async_supabase, request.query_params)
+        rows, next_cursor = flask_module.split_page((await query.execute()).data, limit)
+
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+        return Response(listing_body(request, rows), media_type="application/json", headers=headers)
+    except Exception as e:
+        return error_response(e)
+
+
+@cached_json("fees_all")
+async def get_all_fees_status(request: Request):
+    """Async GET /fees/all; students and ledger rows are fetched concurrently"""
+    try:
+        students_res, ledger_res = await asyncio.gather(
+            async_supabase.table("students").select("*").execute(),
+            flask_module.ledger_query(async_supabase).execute(),
+        )
+        paid, unpaid, overdue = flask_module.split_fees(ledger_res.data)
+
+        result = flask_module.resolve_fee_status(students_res.data, paid, unpaid, overdue)
+        if "latest_amount" in request.query_params.get("include", "").split(","):
+            flask_module.attach_latest_amounts(result, paid, unpaid, overdue)
+
+        return Response(listing_body(request, result), media_type="application/json")
+    except Exception as e:
+        return error_response(e)
+
+
+async def get_payment_history(request: Request):
+    """Async GET /fees/history/<student_id>"""
+    try:
+        student_id = request.path_params["student_id"]
+        res = await flask_module.ledger_query(async_supabase, student_id=student_id).execute()
+        history = flask_module.build_payment_history(*flask_module.split_fees(res.data))
+
+        return Response(json_body(history), media_type="application/json")
+    except Exception as e:
+        return error_response(e)
+
+
+async def get_payment_history_batch(request: Request):
+    """Async POST /fees/history/batch"""
+    try:
+        try:
+            data = await request.json() or {}
+        except ValueError:
+            data = {}
+        student_ids = [sid for sid in data.get("student_ids", []) if sid]
+        if not student_ids:
+            return JSONResponse({})
+        if len(student_ids) > flask_module.MAX_HISTORY_BATCH_SIZE:
+            return JSONResponse({"error": f"At most {flask_module.MAX_HISTORY_BATCH_SIZE} student_ids per request"},
+                                status_code=400)
+
+        # Same chunks as app.fetch_fees, fetched concurrently
+        chunks = flask_module.batched(student_ids, flask_module.LEDGER_IN_CHUNK_SIZE)
+        results = await asyncio.gather(*(
+            flask_module.ledger_query(async_supabase, student_ids=chunk).execute() for chunk in chunks
+        ))
+        paid, unpaid, overdue = flask_module.split_fees([row for res in results for row in res.data])
+
+        return Response(json_body(flask_module.history_batch_result(student_ids, paid, unpaid, overdue)),
+                        media_type="application/json")
+    except Exception as e:
+        return error_response(e)
+
+
+async def client_stats(request: Request):
+    """Pool and breaker stats for both the sync (Flask) and async clients"""
+    return JSONResponse({
+        "sync": flask_module.supabase_transport.stats(),
+        "async": async_transport.stats() if async_transport else None,
+    })
+
+
+routes = [
+    Route("/students", get_students, methods=["GET"]),
+    Route("/fees/all", get_all_fees_status, methods=["GET"]),
+    # Registered before the {student_id} route so "batch" is not taken as an id
+    Route("/fees/history/batch", get_payment_history_batch, methods=["POST"]),
+    Route("/fees/history/{student_id}", get_payment_history, methods=["GET"]),
+    Route("/client/stats", client_stats, methods=["GET"]),
+    # Everything else runs on the Flask app in a thread pool
+    Mount("/", app=FlaskThreadPool(flask_app)),
+]
+
+# Flask-CORS still handles the mounted routes; this covers the native ones
+middleware = [
+    Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+               expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"]),
+    # Only touches responses that are not already encoded (cached listings and Flask routes are)
+    Middleware(GZipMiddleware, minimum_size=flask_module.COMPRESS_MIN_SIZE),
+]
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    workers = int(os.environ.get("ASGI_WORKERS", 1))
+    if workers > 1:
+        # This process only supervises; each worker imports app.py afresh with this set
+        os.environ["CACHE_SHARED_INVALIDATION"] = "1"
+    uvicorn.run("asgi:app", host="0.0.0.0", port=5000, workers=workers)
@@ -0,0 +1,152 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    In-process read-through cache with TTL expiry and LRU eviction.
+
+    Entries are grouped by namespace (e.g. "students", "fees_paid") so write
+    routes can invalidate exactly the listings they change: invalidating bumps
+    the namespace's generation, and entries built under an older generation
+    are never served.
+
+    With a single serving process the generations live in memory. With several
+    worker processes pass `shared` (e.g. SupabaseGenerationStore) so a write in
+    one worker invalidates the others: every lookup then reads the current
+    generation from the shared store, and if that store cannot be reached the
+    cache is bypassed rather than risk serving stale data.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 256, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_errors = 0
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, generation, value)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str):
+        """
+        Counter bumped on every invalidation of `namespace`
+        (None if the shared store could not be read)
+        """
+        if self.shared is not None:
+            try:
+                return self.shared.current(namespace)
+            except Exception:
+                logger.exception("Could not read cache generation of %s", namespace)
+                with self._lock:
+                    self.shared_errors += 1
+                return None
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def lookup(self, namespace: str, key: str) -> tuple:
+        """
+        Return (value, generation): the cached value for (namespace, key), or None
+        if missing, expired or invalidated, and the generation to pass to `set`
+        """
+        generation = self.generation(namespace)
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or generation is None:
+                self.misses += 1
+                return None, generation
+
+            expires_at, entry_generation, value = entry
+            if expires_at < time.monotonic() or entry_generation != generation:
+                del self._entries[(namespace, key)]
+                self.misses += 1
+                return None, generation
+
+            self._entries.move_to_end((namespace, key))
+            self.hits += 1
+            return value, generation
+
+    def get(self, namespace: str, key: str):
+        return self.lookup(namespace, key)[0]
+
+    def set(self, namespace: str, key: str, value, generation=None) -> None:
+        """
+        Store a value built under `generation` (read before the value was built,
+        so a slow read cannot outlive a concurrent write). Skipped if None.
+        """
+        if generation is None:
+            return
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic() + self.ttl, generation, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *namespaces: str) -> None:
+        """
+        Drop every entry belonging to the given namespaces, in every process
+        sharing the generation store
+        """
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for cache_key in [k for k in self._entries if k[0] in namespaces]:
+                del self._entries[cache_key]
+
+        if self.shared is not None:
+            try:
+                self.shared.bump(namespaces)
+            except Exception:
+                # The write itself succeeded; other workers may serve it stale for up to `ttl`
+                logger.exception("Could not invalidate %s in the shared cache store", ", ".join(namespaces))
+                with self._lock:
+                    self.shared_errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "shared": self.shared is not None,
+                "shared_errors": self.shared_errors,
+            }
+
+
+class SupabaseGenerationStore:
+    """
+    Cache generations shared by every worker, kept in Postgres (cache_generations
+    and cache_bump in readme.md). `get_client` returns the Supabase client to use.
+    """
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+
+    def current(self, namespace: str) -> int:
+        rows = self.get_client().table("cache_generations").select("generation").eq("namespace", namespace).execute().data
+        return rows[0]["generation"] if rows else 0
+
+    def bump(self, namespaces) -> None:
+        self.get_client().rpc("cache_bump", {"p_namespaces": list(namespaces)}).execute()
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Strong (unquoted) ETag for a serialized response body
+    """
+    return hashlib.sha1(body).hexdigest()
@@ -0,0 +1,272 @@
+import os
+import time
+import random
+import asyncio
+import threading
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+from metrics import InstrumentedTransport
+
+# Requests that can be repeated without side effects
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling Supabase while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing upstream for `cooldown` seconds after `threshold`
+    consecutive failures, then let a single trial request through (half-open).
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class _ResilienceMixin:
+    """
+    Retry policy, circuit breaker and pool usage counters shared by the sync
+    and async transports below.
+    """
+
+    def __init__(self, transport, pool_size: int, retries: int = 2,
+                 backoff: float = 0.1, breaker: CircuitBreaker = None):
+        self.transport = transport
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _attempts(self, request: httpx.Request) -> int:
+        return self.retries + 1 if request.method in IDEMPOTENT_METHODS else 1
+
+    def _check_breaker(self, request: httpx.Request) -> None:
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("Supabase circuit breaker is open", request=request)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        with self._lock:
+            self.retried += 1
+        # Full jitter: a random time up to the exponential backoff
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _record_error(self, error: httpx.TransportError) -> None:
+        self._end(failed=True, timeout=isinstance(error, httpx.TimeoutException))
+        self.breaker.record_failure()
+
+    def _record_response(self, response: httpx.Response) -> bool:
+        """
+        Returns True if the response should be retried
+        """
+        failed = response.status_code in RETRY_STATUS_CODES
+        self._end(failed=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return failed
+
+    def _begin(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _end(self, failed: bool, timeout: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failures += 1
+            if timeout:
+                self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "pool_saturation": round(self.in_flight / self.pool_size, 3) if self.pool_size else None,
+                "requests": self.requests,
+                "retried": self.retried,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rejected_by_breaker": self.rejected,
+                "breaker_state": self.breaker.state,
+                "breaker_opened": self.breaker.times_opened,
+            }
+
+
+class ResilientTransport(_ResilienceMixin, httpx.BaseTransport):
+    """
+    httpx transport that adds bounded retries with jittered exponential backoff
+    for idempotent requests, a circuit breaker, and pool usage counters.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempts = self._attempts(request)
+        for attempt in range(attempts):
+            self._check_breaker(request)
+            self._begin()
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                self._record_error(e)
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if not self._record_response(response) or attempt == attempts - 1:
+                    return response
+                response.close()
+            time.sleep(self._backoff_delay(attempt))
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncResilientTransport(_ResilienceMixin, httpx.AsyncBaseTransport):
+    """
+    Async counterpart of ResilientTransport for the ASGI serving mode
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempts = self._attempts(request)
+        for attempt in range(attempts):
+            self._check_breaker(request)
+            self._begin()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                self._record_error(e)
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if not self._record_response(response) or attempt == attempts - 1:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _pool_settings() -> dict:
+    """
+    Read the pool, timeout, retry and breaker settings from the environment
+    """
+    pool_size = int(os.environ.get("SUPABASE_POOL_SIZE", 20))
+    read_timeout = float(os.environ.get("SUPABASE_READ_TIMEOUT", 10))
+    return {
+        "pool_size": pool_size,
+        "limits": httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=int(os.environ.get("SUPABASE_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", 30)),
+        ),
+        "timeout": httpx.Timeout(
+            read_timeout,
+            connect=float(os.environ.get("SUPABASE_CONNECT_TIMEOUT", 3)),
+            # Waiting this long for a free pooled connection means the pool is saturated
+            pool=read_timeout,
+        ),
+        "retries": int(os.environ.get("SUPABASE_RETRIES", 2)),
+        "breaker_threshold": int(os.environ.get("SUPABASE_BREAKER_THRESHOLD", 5)),
+        "breaker_cooldown": float(os.environ.get("SUPABASE_BREAKER_COOLDOWN", 30)),
+    }
+
+
+def create_pooled_client(url: str, key: str) -> tuple:
+    """
+    Create a Supabase client on a shared, pooled httpx client.
+
+    Tuned through SUPABASE_POOL_SIZE, SUPABASE_KEEPALIVE, SUPABASE_KEEPALIVE_EXPIRY,
+    SUPABASE_CONNECT_TIMEOUT, SUPABASE_READ_TIMEOUT, SUPABASE_RETRIES,
+    SUPABASE_BREAKER_THRESHOLD and SUPABASE_BREAKER_COOLDOWN.
+    Returns (client, transport) so callers can read the transport stats.
+    """
+    settings = _pool_settings()
+    transport = ResilientTransport(
+        httpx.HTTPTransport(limits=settings["limits"]),
+        pool_size=settings["pool_size"],
+        retries=settings["retries"],
+        breaker=CircuitBreaker(settings["breaker_threshold"], settings["breaker_cooldown"]),
+    )
+    # Instrumented outside the retries, so one logical call counts as one round trip
+    http_client = httpx.Client(transport=InstrumentedTransport(transport), timeout=settings["timeout"],
+                               follow_redirects=True)
+
+    client: Client = create_client(url, key, ClientOptions(httpx_client=http_client))
+    return client, transport
+
+
+async def create_pooled_async_client(url: str, key: str, breaker: CircuitBreaker = None) -> tuple:
+    """
+    Async version of create_pooled_client. Pass the sync transport's breaker
+    to share one view of Supabase health between both clients.
+    """
+    settings = _pool_settings()
+    transport = AsyncResilientTransport(
+        httpx.AsyncHTTPTransport(limits=settings["limits"]),
+        pool_size=settings["pool_size"],
+        retries=settings["retries"],
+        breaker=breaker or CircuitBreaker(settings["breaker_threshold"], settings["breaker_cooldown"]),
+    )
+    http_client = httpx.AsyncClient(transport=transport, timeout=settings["timeout"], follow_redirects=True)
+
+    client: AsyncClient = await acreate_client(url, key, AsyncClientOptions(httpx_client=http_client))
+    return client, transport
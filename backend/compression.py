@@ -0,0 +1,26 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Server preference, best first; the client's q-values still decide
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/csv", "application/x-ndjson"}
+
+
+def choose_encoding(accept_encodings) -> str:
+    """
+    Pick a Content-Encoding from a werkzeug Accept-Encoding header, or None
+    """
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Quality 5 is close to gzip's speed with noticeably smaller output
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
@@ -0,0 +1,42 @@
+import io
+import csv
+import json
+import zlib
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+}
+
+
+def encode_rows(rows, fmt: str, columns: list):
+    """
+    Yield encoded chunks (bytes) for an iterable of row batches.
+    CSV gets a header line first; every batch becomes one chunk.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue().encode("utf-8")
+        for batch in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+    elif fmt == "ndjson":
+        for batch in rows:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in batch).encode("utf-8")
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def gzip_chunks(chunks):
+    """
+    Compress a stream of byte chunks into a gzip stream without buffering it.
+    Each chunk is sync-flushed so the client receives data as soon as it is read.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
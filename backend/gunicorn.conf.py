@@ -0,0 +1,58 @@
+"""
+gunicorn settings for wsgi:application. Every value can be overridden from the
+environment so the same file works for small and large deployments.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+
+# Requests mostly wait on Supabase, so a few processes with several threads each
+# go further than many single-threaded processes
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Each worker has its own response cache. With more than one worker a write handled
+# by one worker must invalidate the others, so cache generations are shared through
+# Postgres (see ResponseCache in cache.py). Set before app.py is imported, preloaded or not.
+if workers > 1:
+    os.environ.setdefault("CACHE_SHARED_INVALIDATION", "1")
+
+# Import app.py (config, Supabase client) once in the master, then fork.
+# Nothing talks to Supabase at import time and upload threads start on first
+# use, so no sockets or threads are shared with the forked workers.
+preload_app = os.environ.get("WEB_PRELOAD", "1") == "1"
+
+# Graceful shutdown: on SIGTERM workers stop accepting, finish in-flight
+# requests and drain queued photo uploads for up to graceful_timeout seconds
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 0))
+
+accesslog = os.environ.get("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+def post_worker_init(worker):
+    """Start the maintenance job scheduler in each worker (threads do not survive fork)"""
+    from app import start_job_scheduler
+
+    start_job_scheduler()
+
+
+def worker_exit(server, worker):
+    """Stop scheduling jobs and let queued background uploads finish before the worker exits"""
+    from app import upload_queue, job_scheduler
+
+    job_scheduler.stop()
+    if not upload_queue.join(timeout=max(graceful_timeout - 5, 1)):
+        server.log.warning("Worker %s exiting with %d uploads still pending",
+                           worker.pid, upload_queue.stats()["pending"])
@@ -0,0 +1,100 @@
+import base64
+import threading
+from datetime import datetime, timezone
+
+from postgrest.types import CountMethod, ReturnMethod
+
+# Outcomes of SupabaseIdempotencyStore.begin
+STARTED = "started"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+class SupabaseIdempotencyStore:
+    """
+    Record of recent Idempotency-Key requests, shared by every worker process
+    through Postgres (idempotency_keys and the idempotency_* functions in readme.md).
+
+    A key is claimed with `begin` before the write runs (an insert-on-conflict,
+    so exactly one request wins it) and either completed with the response to
+    replay or released (`abort`) so the client can retry. Completed keys are
+    kept for `ttl` seconds; a claim that is never completed can be taken over
+    after `pending_timeout`. `cleanup` deletes expired keys.
+    `get_client` returns the Supabase client to use.
+    """
+
+    def __init__(self, get_client, ttl: float = 24 * 3600, pending_timeout: float = 60):
+        self.get_client = get_client
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.replays = 0
+        self.conflicts = 0
+        self.mismatches = 0
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> tuple:
+        """
+        Claim `key` for a request with the given fingerprint.
+        Returns (outcome, stored_response); stored_response is only set for REPLAY.
+        """
+        row = self.get_client().rpc("idempotency_begin", {
+            "p_key": key,
+            "p_fingerprint": fingerprint,
+            "p_pending_seconds": int(self.pending_timeout),
+        }).execute().data[0]
+
+        outcome = row["outcome"]
+        with self._lock:
+            if outcome == MISMATCH:
+                self.mismatches += 1
+            elif outcome == IN_PROGRESS:
+                self.conflicts += 1
+            elif outcome == REPLAY:
+                self.replays += 1
+
+        if outcome != REPLAY:
+            return outcome, None
+        return REPLAY, {
+            "status": row["status"],
+            "body": base64.b64decode(row["body"] or ""),
+            "headers": row["headers"] or {},
+        }
+
+    def complete(self, key: str, response: dict) -> None:
+        """
+        Store the response to replay for `key`
+        """
+        self.get_client().rpc("idempotency_complete", {
+            "p_key": key,
+            "p_status": response["status"],
+            "p_body": base64.b64encode(response["body"]).decode(),
+            "p_headers": response["headers"],
+            "p_ttl_seconds": int(self.ttl),
+        }).execute()
+
+    def abort(self, key: str) -> None:
+        """
+        Release a claim without storing a response (e.g. the write failed with a 5xx)
+        """
+        self.get_client().table("idempotency_keys").delete(returning=ReturnMethod.minimal) \
+            .eq("key", key).is_("status", "null").execute()
+
+    def cleanup(self) -> int:
+        """
+        Delete expired keys; returns the number removed
+        """
+        response = self.get_client().table("idempotency_keys").delete(
+            count=CountMethod.exact, returning=ReturnMethod.minimal
+        ).lt("expires_at", datetime.now(timezone.utc).isoformat()).execute()
+        return response.count or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "pending_timeout": self.pending_timeout,
+                "replays": self.replays,
+                "in_progress_conflicts": self.conflicts,
+                "fingerprint_mismatches": self.mismatches,
+            }
@@ -0,0 +1,44 @@
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; photos are stored as uploaded without it
+    Image = None
+    ImageOps = None
+
+# Longest edge of the stored profile picture and of its thumbnail
+MAX_IMAGE_SIZE = 1024
+THUMBNAIL_SIZE = 160
+IMAGE_FORMAT = "WEBP"
+IMAGE_CONTENT_TYPE = "image/webp"
+IMAGE_EXTENSION = ".webp"
+
+
+def image_processing_available() -> bool:
+    return Image is not None
+
+
+def _encode(image, max_size: int, quality: int) -> bytes:
+    image = image.copy()
+    image.thumbnail((max_size, max_size))
+    out = io.BytesIO()
+    image.save(out, IMAGE_FORMAT, quality=quality, method=4)
+    return out.getvalue()
+
+
+def process_profile_image(content: bytes) -> tuple:
+    """
+    Normalize an uploaded photo and build its thumbnail.
+
+    Applies EXIF orientation, converts to RGB, bounds the dimensions to
+    MAX_IMAGE_SIZE / THUMBNAIL_SIZE and re-encodes both as WebP.
+    Returns (image_bytes, thumbnail_bytes).
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        return _encode(image, MAX_IMAGE_SIZE, 82), _encode(image, THUMBNAIL_SIZE, 75)
@@ -0,0 +1,89 @@
+import io
+import csv
+import json
+from datetime import datetime
+
+# Columns a bulk import may set on `students` (id and photo URLs are managed by the app)
+IMPORT_COLUMNS = [
+    "student_id", "name", "father_name", "email", "phone", "phone2",
+    "emergency_contact", "dob", "address", "gender", "course", "session",
+]
+REQUIRED_COLUMNS = ["student_id", "name"]
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def iter_rows(stream, fmt: str):
+    """
+    Lazily yield (row_number, dict) pairs from a CSV or JSONL byte stream.
+    Rows that cannot be parsed are yielded as (row_number, ImportRowError).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row_number, row in enumerate(reader, start=1):
+            if None in row:
+                yield row_number, ImportRowError("Too many values in row")
+                continue
+            yield row_number, row
+    elif fmt == "jsonl":
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield row_number, ImportRowError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(row, dict):
+                yield row_number, ImportRowError("Expected a JSON object")
+                continue
+            yield row_number, row
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def validate_student(row: dict) -> dict:
+    """
+    Check a raw import row against the `students` schema and return a clean record
+    """
+    unknown = [k for k in row if k not in IMPORT_COLUMNS]
+    if unknown:
+        raise ImportRowError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    record = {}
+    for column in IMPORT_COLUMNS:
+        value = row.get(column)
+        if value is None:
+            continue
+        value = str(value).strip()
+        record[column] = value or None
+
+    for column in REQUIRED_COLUMNS:
+        if not record.get(column):
+            raise ImportRowError(f"Missing required column: {column}")
+
+    if record.get("dob"):
+        try:
+            datetime.strptime(record["dob"], "%Y-%m-%d")
+        except ValueError:
+            raise ImportRowError("dob must be YYYY-MM-DD")
+
+    return record
+
+
+def batched(iterable, size: int):
+    """
+    Yield lists of up to `size` items without materializing `iterable`
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timezone
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+job_runs = metrics.registry.counter(
+    "job_runs_total", "Maintenance job runs", ("job", "trigger", "status"))
+job_duration = metrics.registry.histogram(
+    "job_duration_seconds", "Maintenance job run time", ("job",),
+    (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0))
+job_rows = metrics.registry.counter(
+    "job_rows_affected_total", "Rows changed by maintenance jobs", ("job",))
+
+
+class JobBusyError(RuntimeError):
+    """Raised by JobScheduler.run when another process holds the job's lock"""
+
+
+class SupabaseJobStore:
+    """
+    Cross-process job locking and run history on Postgres (job_locks / job_runs
+    and the job_try_start / job_finish functions in readme.md).
+
+    `get_client` returns the Supabase client to use, so the store follows the
+    app's client if it is replaced.
+    """
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+
+    def try_start(self, job: str, owner: str, lease_seconds: int, force: bool) -> bool:
+        return bool(self.get_client().rpc("job_try_start", {
+            "p_job": job,
+            "p_owner": owner,
+            "p_lease_seconds": lease_seconds,
+            "p_force": force,
+        }).execute().data)
+
+    def finish(self, job: str, owner: str, interval_seconds: int) -> None:
+        self.get_client().rpc("job_finish", {
+            "p_job": job,
+            "p_owner": owner,
+            "p_interval_seconds": interval_seconds,
+        }).execute()
+
+    def record(self, result: dict) -> None:
+        self.get_client().table("job_runs").insert(result).execute()
+
+    def recent_runs(self, limit: int = 20) -> list:
+        return self.get_client().table("job_runs").select("*").order("started_at", desc=True).limit(limit).execute().data
+
+
+class JobScheduler:
+    """
+    Runs registered maintenance jobs every `interval` seconds from a daemon thread.
+
+    Every process may run a scheduler; a job only runs where `store.try_start`
+    grants its lock, and the lock also records when the job is next due, so
+    each job runs once per interval across all workers. A job function returns
+    the number of rows it changed.
+    """
+
+    def __init__(self, store, poll_interval: float = 60, lease_seconds: int = 600):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs = {}
+        self.last_results = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, func, interval: float) -> None:
+        """
+        Add a job; an interval of 0 keeps it manual-only
+        """
+        self.jobs[name] = {"func": func, "interval": interval}
+
+    def start(self) -> bool:
+        """
+        Start the background loop (once per process); False if nothing is scheduled
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            if not any(job["interval"] for job in self.jobs.values()):
+                return False
+            # A forked worker inherits the parent's owner id; give it its own
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="job-scheduler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        """
+        Scheduler loop; also usable in the foreground for a sidecar process
+        """
+        # Spread workers that start together
+        next_check = {name: time.monotonic() + random.uniform(0, min(self.poll_interval, 5))
+                      for name, job in self.jobs.items() if job["interval"]}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for name, due in next_check.items():
+                if due > now:
+                    continue
+                interval = self.jobs[name]["interval"]
+                try:
+                    self.run(name, trigger="schedule")
+                    next_check[name] = time.monotonic() + interval
+                except JobBusyError:
+                    # Running elsewhere or not due yet; ask again later
+                    next_check[name] = time.monotonic() + min(interval, self.poll_interval)
+                except Exception:
+                    logger.exception("Job scheduler could not run %s", name)
+                    next_check[name] = time.monotonic() + min(interval, self.poll_interval)
+            wait = min(next_check.values(), default=now + self.poll_interval) - time.monotonic()
+            self._stop.wait(max(wait, 1))
+
+    def run(self, name: str, trigger: str = "manual") -> dict:
+        """
+        Run a job now if its lock can be taken. Scheduled runs also wait until
+        the job is due; manual runs only wait for a run in progress.
+        Raises KeyError for unknown jobs and JobBusyError if the lock is held.
+        """
+        job = self.jobs[name]
+        if not self.store.try_start(name, self.owner, self.lease_seconds, trigger == "manual"):
+            raise JobBusyError(f"Job {name} is already running or not due")
+
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        result = {
+            "job": name,
+            "owner": self.owner,
+            "trigger": trigger,
+            "started_at": started_at.isoformat(),
+            "status": "ok",
+            "rows_affected": None,
+            "error": None,
+        }
+        try:
+            result["rows_affected"] = job["func"]()
+        except Exception as e:
+            logger.exception("Job %s failed", name)
+            result["status"] = "error"
+            result["error"] = str(e)
+        finally:
+            result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._finish(name, job, result)
+        return result
+
+    def _finish(self, name: str, job: dict, result: dict) -> None:
+        self.last_results[name] = result
+        job_runs.inc(name, result["trigger"], result["status"])
+        job_duration.observe(result["duration_ms"] / 1000, name)
+        job_rows.inc(name, amount=result["rows_affected"] or 0)
+        logger.info("Job %s finished: %s", name, result)
+        try:
+            self.store.finish(name, self.owner, int(job["interval"]))
+            self.store.record(result)
+        except Exception:
+            # The lease expires on its own; losing one history row is acceptable
+            logger.exception("Could not record run of job %s", name)
+
+    def stats(self) -> dict:
+        return {
+            "owner": self.owner,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "jobs": {
+                name: {"interval": job["interval"], "last_run": self.last_results.get(name)}
+                for name, job in self.jobs.items()
+            },
+        }
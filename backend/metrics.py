@@ -0,0 +1,259 @@
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+
+import httpx
+
+# Prometheus' default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            series = self._values.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    bucket = _format_labels(self.labels, values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+                bucket = _format_labels(self.labels, values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled", ("route", "method", "status"))
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "Total time to handle a request", ("route",))
+http_db_time = registry.histogram(
+    "http_request_db_seconds", "Time a request spent waiting on Supabase", ("route",))
+http_serialize_time = registry.histogram(
+    "http_request_serialize_seconds", "Time a request spent encoding JSON", ("route",))
+http_upstream_calls = registry.histogram(
+    "http_request_supabase_calls", "Supabase round trips per request", ("route",), COUNT_BUCKETS)
+http_response_bytes = registry.histogram(
+    "http_response_bytes", "Response body size", ("route",), SIZE_BUCKETS)
+upstream_calls = registry.counter(
+    "supabase_calls_total", "Supabase round trips", ("target", "method", "status"))
+upstream_duration = registry.histogram(
+    "supabase_call_duration_seconds", "Supabase round trip time including the body", ("target",))
+upstream_sent = registry.counter(
+    "supabase_request_bytes_total", "Bytes sent to Supabase", ("target",))
+upstream_received = registry.counter(
+    "supabase_response_bytes_total", "Bytes received from Supabase", ("target",))
+
+
+class RequestMetrics:
+    """
+    Per-request accumulator, reachable from the transport through a context variable
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_calls = 0
+        self.db_time = 0.0
+        self.db_bytes = 0
+        self.serialize_time = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "db_calls": self.db_calls,
+            "db_ms": round(self.db_time * 1000, 1),
+            "db_bytes": self.db_bytes,
+            "serialize_ms": round(self.serialize_time * 1000, 1),
+        }
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def start_request() -> RequestMetrics:
+    current = RequestMetrics()
+    _current.set(current)
+    return current
+
+
+def current_request() -> RequestMetrics:
+    return _current.get()
+
+
+def end_request(route: str, method: str, status: int, response_bytes: int = None) -> dict:
+    """
+    Record the finished request and return its summary (None outside a request)
+    """
+    current = _current.get()
+    if current is None:
+        return None
+    _current.set(None)
+
+    summary = current.summary()
+    http_requests.inc(route, method, str(status))
+    http_duration.observe(summary["duration_ms"] / 1000, route)
+    http_db_time.observe(current.db_time, route)
+    http_serialize_time.observe(current.serialize_time, route)
+    http_upstream_calls.observe(current.db_calls, route)
+    if response_bytes is not None:
+        http_response_bytes.observe(response_bytes, route)
+        summary["response_bytes"] = response_bytes
+    return summary
+
+
+def record_serialization(seconds: float) -> None:
+    current = _current.get()
+    if current is not None:
+        current.serialize_time += seconds
+
+
+def upstream_target(url: httpx.URL) -> str:
+    """
+    Bounded label for a Supabase URL: the table, rpc/<function> or storage
+    """
+    parts = url.path.strip("/").split("/")
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        return "/".join(parts[2:4]) if parts[2] == "rpc" else parts[2]
+    if parts[:1] == ["storage"]:
+        return "storage"
+    return "other"
+
+
+class _CountingStream(httpx.SyncByteStream):
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._on_close(self.size)
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """
+    Times every Supabase call (PostgREST and Storage) until its body is read,
+    counts bytes both ways and adds the numbers to the current request
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        target = upstream_target(request.url)
+        current = _current.get()
+        sent = int(request.headers.get("content-length") or 0)
+        started = time.perf_counter()
+
+        def finish(received: int, status: str) -> None:
+            elapsed = time.perf_counter() - started
+            upstream_calls.inc(target, request.method, status)
+            upstream_duration.observe(elapsed, target)
+            upstream_sent.inc(target, amount=sent)
+            upstream_received.inc(target, amount=received)
+            if current is not None:
+                current.db_calls += 1
+                current.db_time += elapsed
+                current.db_bytes += sent + received
+
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TransportError as e:
+            finish(0, type(e).__name__)
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_CountingStream(response.stream, lambda size: finish(size, str(response.status_code))),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py refuses to start without a key; nothing is sent anywhere in these tests
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("JOBS_ENABLED", "0")
+
+import app as app_module  # noqa: E402
+
+
+class FakeSupabase:
+    """
+    Records every request the app sends to Supabase and answers it with
+    `respond(request)`: by default an empty JSON array, or an upload
+    receipt for Storage uploads
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.respond = self.default_response
+
+    @staticmethod
+    def default_response(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and request.url.path.startswith("/storage/v1/object/"):
+            key = request.url.path.removeprefix("/storage/v1/object/")
+            return httpx.Response(200, json={"Key": key, "Id": "test"})
+        return httpx.Response(200, json=[])
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        self.requests.append(request)
+        return self.respond(request)
+
+    def calls(self, method: str = None, path: str = None) -> list:
+        return [r for r in self.requests
+                if (method is None or r.method == method) and (path is None or r.url.path == path)]
+
+
+def json_body(request: httpx.Request):
+    return json.loads(request.content) if request.content else None
+
+
+@pytest.fixture
+def supabase_mock(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(app_module.supabase_transport, "transport", httpx.MockTransport(fake.handle))
+    app_module.response_cache.clear()
+    return fake
+
+
+@pytest.fixture
+def client(supabase_mock):
+    app_module.app.config.update(TESTING=True)
+    return app_module.app.test_client()
@@ -0,0 +1,50 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import pytest
+from flask import jsonify
+
+import app as app_module
+
+asgi = pytest.importorskip("asgi")
+
+DELAY = 0.3
+REQUESTS = 4
+
+
+async def get_concurrently(path: str, count: int) -> list:
+    transport = httpx.ASGITransport(app=asgi.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(http.get(path) for _ in range(count)))
+
+
+def test_mounted_flask_routes_run_concurrently(supabase_mock, monkeypatch):
+    threads = set()
+
+    def slow_health_check():
+        threads.add(threading.current_thread().name)
+        time.sleep(DELAY)
+        return jsonify({"status": "healthy"})
+    monkeypatch.setitem(app_module.app.view_functions, "health_check", slow_health_check)
+
+    started = time.perf_counter()
+    responses = asyncio.run(get_concurrently("/health", REQUESTS))
+    elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * REQUESTS
+    # One after another this would take REQUESTS * DELAY
+    assert elapsed < 2 * DELAY, f"{REQUESTS} requests took {elapsed:.2f}s"
+    assert len(threads) == REQUESTS
+
+
+def test_mounted_flask_route_streams_a_body(supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(200, json=[
+        {"id": 1, "student_id": "S1", "name": "Ayesha", "course": "BSc", "fee_ledger": []}
+    ])
+
+    response, = asyncio.run(get_concurrently("/export/fees?format=csv", 1))
+
+    assert response.status_code == 200
+    assert response.text.splitlines()[1] == "1,S1,Ayesha,BSc,unpaid,,"
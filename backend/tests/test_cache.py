@@ -0,0 +1,71 @@
+import pytest
+
+from cache import ResponseCache
+
+
+class MemoryGenerations:
+    """Stands in for SupabaseGenerationStore: one store shared by several caches"""
+
+    def __init__(self):
+        self.generations = {}
+        self.fail = False
+
+    def current(self, namespace):
+        if self.fail:
+            raise ConnectionError("store unavailable")
+        return self.generations.get(namespace, 0)
+
+    def bump(self, namespaces):
+        if self.fail:
+            raise ConnectionError("store unavailable")
+        for namespace in namespaces:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+
+def fill(cache, namespace="students", key="/students?", value="v1"):
+    _, generation = cache.lookup(namespace, key)
+    cache.set(namespace, key, value, generation=generation)
+
+
+def test_invalidation_in_one_worker_reaches_the_others():
+    store = MemoryGenerations()
+    worker_a = ResponseCache(shared=store)
+    worker_b = ResponseCache(shared=store)
+    fill(worker_a)
+    assert worker_a.get("students", "/students?") == "v1"
+
+    worker_b.invalidate("students")
+
+    assert worker_a.get("students", "/students?") is None
+
+
+def test_value_built_across_an_invalidation_is_not_served():
+    cache = ResponseCache()
+    _, generation = cache.lookup("students", "k")
+    cache.invalidate("students")  # a write lands while the read is running
+    cache.set("students", "k", "stale", generation=generation)
+
+    assert cache.get("students", "k") is None
+
+
+def test_unreachable_shared_store_bypasses_the_cache():
+    store = MemoryGenerations()
+    cache = ResponseCache(shared=store)
+    fill(cache)
+
+    store.fail = True
+    value, generation = cache.lookup("students", "/students?")
+    assert value is None and generation is None
+    cache.set("students", "/students?", "v2", generation=generation)
+    cache.invalidate("students")  # logged, not raised
+
+    store.fail = False
+    assert cache.stats()["shared_errors"] == 2
+
+
+def test_configure_app_rejects_import_time_settings():
+    import wsgi
+
+    with pytest.raises(ValueError, match="CACHE_TTL"):
+        wsgi.configure_app({"CACHE_TTL": 0})
+    assert wsgi.configure_app({"APPLICATION_ROOT": "/"}).config["APPLICATION_ROOT"] == "/"
@@ -0,0 +1,198 @@
+import json
+import time
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from client import CircuitBreaker, CircuitOpenError, ResilientTransport, create_pooled_client
+
+
+def transport_for(handler, retries: int = 2, breaker: CircuitBreaker = None) -> ResilientTransport:
+    return ResilientTransport(httpx.MockTransport(handler), pool_size=4, retries=retries,
+                              backoff=0, breaker=breaker or CircuitBreaker(threshold=100))
+
+
+def statuses(*codes):
+    """Handler answering with the given status codes in turn, counting calls"""
+    remaining = list(codes)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(remaining.pop(0) if len(remaining) > 1 else remaining[0])
+    return handler, calls
+
+
+def test_idempotent_request_is_retried_until_it_succeeds():
+    handler, calls = statuses(503, 502, 200)
+    transport = transport_for(handler)
+
+    with httpx.Client(transport=transport) as http:
+        assert http.get("http://supabase/rest/v1/students").status_code == 200
+
+    assert len(calls) == 3
+    assert transport.stats()["retried"] == 2
+    assert transport.stats()["failures"] == 2
+
+
+def test_last_failed_response_is_returned_after_all_attempts():
+    handler, calls = statuses(503)
+    transport = transport_for(handler, retries=1)
+
+    with httpx.Client(transport=transport) as http:
+        assert http.get("http://supabase/rest/v1/students").status_code == 503
+    assert len(calls) == 2
+
+
+def test_writes_are_not_retried():
+    handler, calls = statuses(503, 200)
+    transport = transport_for(handler)
+
+    with httpx.Client(transport=transport) as http:
+        assert http.post("http://supabase/rest/v1/rpc/fee_mark_paid", json={}).status_code == 503
+    assert len(calls) == 1
+
+
+def test_timeouts_are_counted_and_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+    transport = transport_for(handler)
+
+    with httpx.Client(transport=transport) as http, pytest.raises(httpx.ReadTimeout):
+        http.get("http://supabase/rest/v1/students")
+
+    assert len(calls) == 3
+    assert transport.stats()["timeouts"] == 3
+
+
+def test_breaker_opens_rejects_and_recovers_through_one_trial():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    handler, calls = statuses(503, 503, 200)
+    transport = transport_for(handler, retries=0, breaker=breaker)
+
+    with httpx.Client(transport=transport) as http:
+        http.get("http://supabase/rest/v1/students")
+        http.get("http://supabase/rest/v1/students")
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            http.get("http://supabase/rest/v1/students")
+        assert len(calls) == 2
+        assert transport.stats()["rejected_by_breaker"] == 1
+
+        time.sleep(0.06)
+        assert breaker.state == "half_open"
+        assert http.get("http://supabase/rest/v1/students").status_code == 200
+        assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_a_single_trial_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.times_opened == 2
+
+
+# ---- Load test against a local stub PostgREST ----
+
+class StubPostgrest(BaseHTTPRequestHandler):
+    """
+    GET /rest/v1/students?flaky=eq.<n>: 503 the first time <n> is seen, then a row
+    GET /rest/v1/slow: answers after the client's read timeout
+    """
+    seen = set()
+    lock = threading.Lock()
+    delay = 0.005
+
+    def do_GET(self):
+        if self.path.startswith("/rest/v1/slow"):
+            time.sleep(0.5)
+            return self.reply(200, [])
+
+        with self.lock:
+            first = self.path not in self.seen
+            self.seen.add(self.path)
+        time.sleep(self.delay)
+        if first and "flaky=" in self.path:
+            return self.reply(503, {"message": "unavailable"})
+        self.reply(200, [{"id": 1}])
+
+    def reply(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPostgrest)
+    server.daemon_threads = True
+    StubPostgrest.seen = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pooled_env(monkeypatch):
+    monkeypatch.setenv("SUPABASE_POOL_SIZE", "8")
+    monkeypatch.setenv("SUPABASE_READ_TIMEOUT", "0.2")
+    monkeypatch.setenv("SUPABASE_RETRIES", "2")
+    monkeypatch.setenv("SUPABASE_BREAKER_THRESHOLD", "1000")
+
+
+def test_load_through_pool_with_flaky_upstream(stub_url, pooled_env):
+    client, transport = create_pooled_client(stub_url, "test-key")
+    requests = 300
+
+    def call(n):
+        started = time.perf_counter()
+        rows = client.table("students").select("id").eq("flaky", n).execute().data
+        return rows, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+    transport.close()
+
+    assert all(rows == [{"id": 1}] for rows, _ in results)
+    stats = transport.stats()
+    # Every request failed once and succeeded on its retry
+    assert stats["requests"] == 2 * requests
+    assert stats["retried"] == requests
+    assert stats["in_flight"] == 0
+    timings = [ms for _, ms in results]
+    print(f"{requests} calls in {elapsed:.2f}s ({requests / elapsed:.0f}/s), "
+          f"p50 {statistics.median(timings):.1f} ms, p95 {statistics.quantiles(timings, n=20)[-1]:.1f} ms, "
+          f"peak in flight {stats['peak_in_flight']}")
+
+
+def test_read_timeout_against_slow_upstream(stub_url, pooled_env):
+    client, transport = create_pooled_client(stub_url, "test-key")
+
+    with pytest.raises(httpx.ReadTimeout):
+        client.table("slow").select("*").execute()
+    transport.close()
+
+    assert transport.stats()["timeouts"] == 3
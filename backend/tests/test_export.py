@@ -0,0 +1,44 @@
+import httpx
+
+import app as app_module
+
+
+def test_fee_export_embeds_the_ledger_in_each_student_page(supabase_mock):
+    pages = {
+        None: [
+            {"id": 1, "student_id": "S1", "name": "Ayesha", "course": "BSc", "fee_ledger": [
+                {"id": 12, "status": "unpaid", "amount": 50, "paid_date": None},
+                {"id": 11, "status": "paid", "amount": 40, "paid_date": "2026-01-05"},
+            ]},
+            {"id": 2, "student_id": "S2", "name": "Bilal", "course": "BBA", "fee_ledger": [
+                {"id": 13, "status": "overdue", "amount": 70, "paid_date": None},
+            ]},
+        ],
+        "gt.2": [{"id": 3, "student_id": "S3", "name": "Chen", "course": "MBA", "fee_ledger": []}],
+    }
+    supabase_mock.respond = lambda request: httpx.Response(200, json=pages[request.url.params.get("id")])
+
+    rows = [row for page in app_module.iter_fee_status_pages(page_size=2) for row in page]
+
+    assert [(r["student_id"], r["status"], r["amount"]) for r in rows] == [
+        ("S1", "paid", 40), ("S2", "overdue", 70), ("S3", "unpaid", None)
+    ]
+    queries = supabase_mock.calls("GET")
+    assert [q.url.path for q in queries] == ["/rest/v1/students", "/rest/v1/students"]
+    assert queries[0].url.params["select"] == "id,student_id,name,course,fee_ledger(id,status,amount,paid_date)"
+    assert queries[1].url.params["id"] == "gt.2"
+
+
+def test_fee_export_streams_ndjson(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(200, json=[
+        {"id": 1, "student_id": "S1", "name": "Ayesha", "course": "BSc", "fee_ledger": []}
+    ])
+
+    response = client.get("/export/fees?format=ndjson")
+
+    assert response.mimetype == "application/x-ndjson"
+    assert response.get_data(as_text=True) == (
+        '{"id": 1, "student_id": "S1", "name": "Ayesha", "course": "BSc", '
+        '"status": "unpaid", "amount": null, "last_date": null}\n'
+    )
+    assert not supabase_mock.calls(path="/rest/v1/fee_ledger")
@@ -0,0 +1,124 @@
+"""
+Benchmark of fee lookups and transitions on the legacy three-table layout
+(fees_paid / fees_unpaid / fees_overdue) against fee_ledger, on a real
+database. Seeds LEDGER_BENCH_STUDENTS students (default 2000) with the same fees
+in both layouts under a unique prefix, then deletes them. Skipped unless
+SUPABASE_TEST_URL and SUPABASE_TEST_KEY are set and the legacy tables exist.
+"""
+import os
+import time
+import uuid
+import random
+import statistics
+
+import pytest
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from app import FEE_LEDGER, FEE_LEDGER_SELECT, LEGACY_FEE_TABLES, ledger_query
+from client import create_pooled_client
+from test_fee_transitions_db import legacy_transition, transition
+
+TEST_URL = os.environ.get("SUPABASE_TEST_URL")
+TEST_KEY = os.environ.get("SUPABASE_TEST_KEY")
+STUDENTS = int(os.environ.get("LEDGER_BENCH_STUDENTS", 2000))
+SEED_BATCH_SIZE = 1000
+LOOKUPS = 50
+
+pytestmark = pytest.mark.skipif(not (TEST_URL and TEST_KEY),
+                                reason="SUPABASE_TEST_URL / SUPABASE_TEST_KEY not set")
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client, transport = create_pooled_client(TEST_URL, TEST_KEY)
+    try:
+        for table in LEGACY_FEE_TABLES:
+            client.table(table).select("id").limit(1).execute()
+    except APIError:
+        transport.close()
+        pytest.skip("legacy fees_* tables are not present")
+
+    prefix = f"ledger{uuid.uuid4().hex[:6]}"
+    rng = random.Random(7)
+    ids = [f"{prefix}-{i:05d}" for i in range(STUDENTS)]
+    for start in range(0, STUDENTS, SEED_BATCH_SIZE):
+        batch = ids[start:start + SEED_BATCH_SIZE]
+        client.table("students").insert([{"student_id": sid, "name": sid} for sid in batch],
+                                        returning=ReturnMethod.minimal).execute()
+        legacy = {table: [] for table in LEGACY_FEE_TABLES}
+        ledger = []
+        for sid in batch:
+            status = rng.choice(["paid", "paid", "unpaid", "overdue"])
+            table = next(t for t, s in LEGACY_FEE_TABLES.items() if s == status)
+            legacy_row = {"student_id": sid, "name": sid, "amount": "100"}
+            ledger_row = {"student_id": sid, "status": status, "amount": 100}
+            if status == "paid":
+                legacy_row["date"] = ledger_row["paid_date"] = "2026-01-01"
+            legacy[table].append(legacy_row)
+            ledger.append(ledger_row)
+        for table, rows in legacy.items():
+            client.table(table).insert(rows, returning=ReturnMethod.minimal).execute()
+        client.table(FEE_LEDGER).insert(ledger, returning=ReturnMethod.minimal).execute()
+
+    yield client, prefix, ids
+    for table in LEGACY_FEE_TABLES:
+        client.table(table).delete().like("student_id", f"{prefix}-%").execute()
+    # Ledger rows go with the students (ON DELETE CASCADE)
+    client.table("students").delete().like("student_id", f"{prefix}-%").execute()
+    transport.close()
+
+
+def timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def report(name: str, before: list, after: list) -> tuple:
+    before_p50, after_p50 = statistics.median(before), statistics.median(after)
+    print(f"{name}: three tables p50 {before_p50:.1f} ms, "
+          f"ledger p50 {after_p50:.1f} ms ({len(after)} runs, {STUDENTS} students)")
+    return before_p50, after_p50
+
+
+def test_history_lookup(seeded):
+    client, _, ids = seeded
+    sample = random.Random(1).sample(ids, LOOKUPS)
+
+    def legacy(sid):
+        for table in LEGACY_FEE_TABLES:
+            client.table(table).select("*").eq("student_id", sid).execute()
+
+    def ledger(sid):
+        ledger_query(client, student_id=sid).execute()
+
+    before_p50, after_p50 = report("one student's history",
+                                   [timed(legacy, sid) for sid in sample], [timed(ledger, sid) for sid in sample])
+    assert after_p50 < before_p50
+
+
+def test_status_listing(seeded):
+    client, prefix, _ = seeded
+
+    def legacy():
+        for table in LEGACY_FEE_TABLES:
+            client.table(table).select("*").like("student_id", f"{prefix}-%").execute()
+
+    def ledger():
+        client.table(FEE_LEDGER).select(FEE_LEDGER_SELECT).like("student_id", f"{prefix}-%").execute()
+
+    report("every fee", [timed(legacy) for _ in range(5)], [timed(ledger) for _ in range(5)])
+
+
+def test_transition(seeded):
+    client, _, ids = seeded
+    sample = random.Random(2).sample(ids, LOOKUPS)
+    kinds = ["overdue", "paid"] * (LOOKUPS // 2)
+
+    before_p50, after_p50 = report(
+        "fee transition",
+        [legacy_transition(client, sid, kind) for sid, kind in zip(sample, kinds)],
+        [transition(client, sid, kind) for sid, kind in zip(sample, kinds)],
+    )
+    assert after_p50 < before_p50
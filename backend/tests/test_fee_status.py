@@ -0,0 +1,69 @@
+import time
+import random
+
+import pytest
+
+from app import resolve_fee_status
+
+STUDENT = {"id": 1, "student_id": "S1", "name": "Ayesha", "course": "BSc"}
+
+
+def fee(student_id: str, amount, date: str = None) -> dict:
+    return {"id": 1, "student_id": student_id, "name": None, "amount": amount, "date": date}
+
+
+@pytest.mark.parametrize("paid, unpaid, overdue, expected", [
+    ([fee("S1", 10, "2026-01-05")], [fee("S1", 20)], [fee("S1", 30)], ("overdue", 30, None)),
+    ([fee("S1", 10, "2026-01-05")], [fee("S1", 20)], [], ("paid", 10, "2026-01-05")),
+    ([], [fee("S1", 20)], [], ("unpaid", 20, None)),
+    ([], [], [], ("unpaid", None, None)),
+    ([fee("S2", 10, "2026-01-05")], [], [fee("S2", 30)], ("unpaid", None, None)),
+])
+def test_status_priority_is_overdue_then_paid_then_unpaid(paid, unpaid, overdue, expected):
+    result, = resolve_fee_status([STUDENT], paid, unpaid, overdue)
+
+    assert (result["status"], result["amount"], result["last_date"]) == expected
+    assert {k: result[k] for k in STUDENT} == STUDENT
+
+
+def test_first_row_per_student_wins():
+    result, = resolve_fee_status([STUDENT], [fee("S1", 10, "2026-02-01"), fee("S1", 99, "2026-03-01")], [], [])
+
+    assert result["amount"] == 10
+
+
+# ---- Scaling benchmark on synthetic data ----
+
+def synthetic_fees(students: int, seed: int = 1) -> tuple:
+    """Students plus a ledger split like production: mostly one fee each, some with several"""
+    rng = random.Random(seed)
+    rows = [{"id": i, "student_id": f"S{i:06d}", "name": f"Student {i}", "course": "BSc"} for i in range(students)]
+    fees = {"paid": [], "unpaid": [], "overdue": []}
+    for row in rows:
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            status = rng.choice(["paid", "paid", "unpaid", "overdue"])
+            fees[status].append(fee(row["student_id"], rng.randrange(1000), "2026-01-01" if status == "paid" else None))
+    return rows, fees["paid"], fees["unpaid"], fees["overdue"]
+
+
+def best_of(runs: int, fn, *args) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def test_resolver_scales_linearly():
+    per_student = {}
+    for students in (1_000, 10_000, 100_000):
+        data = synthetic_fees(students)
+        seconds = best_of(3, resolve_fee_status, *data)
+        per_student[students] = seconds / students
+        print(f"resolve_fee_status: {students} students in {seconds * 1000:.1f} ms "
+              f"({per_student[students] * 1e6:.2f} us/student)")
+
+    # Indexed lookups keep the cost per student roughly flat (cache effects aside);
+    # scanning the fee lists per student would make it ~100x at 100k
+    assert per_student[100_000] <= 10 * per_student[1_000]
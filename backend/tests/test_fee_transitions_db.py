@@ -0,0 +1,133 @@
+"""
+Integration tests for the fee_* transition functions (readme.md) against a real
+database. Skipped unless SUPABASE_TEST_URL and SUPABASE_TEST_KEY point at a
+Supabase instance with the schema applied; test students are created with a
+unique prefix and deleted afterwards.
+
+The latency test compares each function with the sequence of REST calls the API
+made before they existed (on the legacy fees_* tables, if present).
+"""
+import os
+import time
+import uuid
+import random
+import statistics
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from postgrest.exceptions import APIError
+
+from client import create_pooled_client
+
+TEST_URL = os.environ.get("SUPABASE_TEST_URL")
+TEST_KEY = os.environ.get("SUPABASE_TEST_KEY")
+# p95 latency budget for one transition call, in milliseconds
+P95_BUDGET_MS = float(os.environ.get("FEE_TRANSITION_P95_MS", 250))
+
+pytestmark = pytest.mark.skipif(not (TEST_URL and TEST_KEY),
+                                reason="SUPABASE_TEST_URL / SUPABASE_TEST_KEY not set")
+
+STUDENTS = 5
+CALLS_PER_STUDENT = 20
+LATENCY_ROUNDS = 5
+
+
+@pytest.fixture
+def db():
+    client, transport = create_pooled_client(TEST_URL, TEST_KEY)
+    yield client
+    transport.close()
+
+
+@pytest.fixture
+def student_ids(db):
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    ids = [f"{prefix}-{i}" for i in range(STUDENTS)]
+    db.table("students").insert([{"student_id": sid, "name": sid} for sid in ids]).execute()
+    db.table("fee_ledger").insert([{"student_id": sid, "status": "unpaid", "amount": 0} for sid in ids]).execute()
+    yield ids
+    # fee_ledger rows go with the students (ON DELETE CASCADE)
+    db.table("students").delete().like("student_id", f"{prefix}-%").execute()
+    for table in ("fees_paid", "fees_unpaid", "fees_overdue"):
+        try:
+            db.table(table).delete().like("student_id", f"{prefix}-%").execute()
+        except APIError:
+            pass
+
+
+@pytest.fixture
+def legacy_tables(db):
+    try:
+        for table in ("fees_paid", "fees_unpaid", "fees_overdue"):
+            db.table(table).select("id").limit(1).execute()
+    except APIError:
+        pytest.skip("legacy fees_* tables are not present")
+
+
+def transition(db, student_id: str, kind: str) -> float:
+    started = time.perf_counter()
+    if kind == "paid":
+        db.rpc("fee_mark_paid", {"p_student_id": student_id, "p_amount": 100, "p_date": "2026-01-01"}).execute()
+    else:
+        db.rpc("fee_move_overdue", {"p_student_id": student_id, "p_amount": 100}).execute()
+    return (time.perf_counter() - started) * 1000
+
+
+def legacy_transition(db, student_id: str, kind: str) -> float:
+    """The requests /fees/pay and /fees/move_overdue sent before the fee_* functions"""
+    started = time.perf_counter()
+    name = db.table("students").select("name").eq("student_id", student_id).execute().data[0]["name"]
+    if kind == "paid":
+        if db.table("fees_unpaid").select("*").eq("student_id", student_id).execute().data:
+            db.table("fees_unpaid").delete().eq("student_id", student_id).execute()
+        if db.table("fees_overdue").select("*").eq("student_id", student_id).execute().data:
+            db.table("fees_overdue").delete().eq("student_id", student_id).execute()
+        db.table("fees_paid").insert({"student_id": student_id, "name": name, "amount": "100",
+                                      "date": "2026-01-01"}).execute()
+    else:
+        db.table("fees_unpaid").delete().eq("student_id", student_id).execute()
+        db.table("fees_overdue").insert({"student_id": student_id, "name": name, "amount": "100"}).execute()
+    return (time.perf_counter() - started) * 1000
+
+
+def test_concurrent_transitions_leave_one_open_fee(db, student_ids):
+    calls = [(sid, random.choice(["paid", "overdue"])) for sid in student_ids for _ in range(CALLS_PER_STUDENT)]
+    random.shuffle(calls)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda call: transition(db, *call), calls))
+
+    rows = db.table("fee_ledger").select("student_id,status").in_("student_id", student_ids).execute().data
+    open_fees = Counter((row["student_id"], row["status"]) for row in rows if row["status"] != "paid")
+    for sid in student_ids:
+        # Counted per row, so two overdue rows for one student fail too
+        student_open = {status: n for (s, status), n in open_fees.items() if s == sid}
+        assert sum(student_open.values()) <= 1, f"{sid} has open fees {student_open}"
+        assert "unpaid" not in student_open
+
+
+def test_repeated_move_overdue_keeps_one_overdue_fee(db, student_ids):
+    sid = student_ids[0]
+    for _ in range(3):
+        transition(db, sid, "overdue")
+
+    rows = db.table("fee_ledger").select("status").eq("student_id", sid).execute().data
+    assert [row["status"] for row in rows] == ["overdue"]
+
+
+def summarize(timings: list) -> tuple:
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+def test_transition_latency_before_and_after(db, student_ids, legacy_tables):
+    kinds = ("overdue", "paid") * LATENCY_ROUNDS
+    before = [legacy_transition(db, sid, kind) for sid in student_ids for kind in kinds]
+    after = [transition(db, sid, kind) for sid in student_ids for kind in kinds]
+
+    before_p50, before_p95 = summarize(before)
+    after_p50, after_p95 = summarize(after)
+    print(f"fee transitions, {len(after)} calls each: REST sequence p50 {before_p50:.1f} ms / p95 {before_p95:.1f} ms, "
+          f"fee_* function p50 {after_p50:.1f} ms / p95 {after_p95:.1f} ms")
+    assert after_p95 <= P95_BUDGET_MS
+    assert after_p50 < before_p50
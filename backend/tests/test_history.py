@@ -0,0 +1,31 @@
+import app as app_module
+
+
+def test_batch_history_reads_the_ledger_once(client, supabase_mock):
+    response = client.post("/fees/history/batch", json={"student_ids": ["S1", "S2"]})
+
+    assert response.status_code == 200
+    assert response.get_json() == {sid: {"latest_amount": None, "history": []} for sid in ("S1", "S2")}
+    query, = supabase_mock.calls("GET", "/rest/v1/fee_ledger")
+    assert query.url.params["student_id"] == "in.(S1,S2)"
+
+
+def test_batch_history_rejects_more_ids_than_the_cap(client, supabase_mock):
+    ids = [f"S{i}" for i in range(app_module.MAX_HISTORY_BATCH_SIZE + 1)]
+
+    response = client.post("/fees/history/batch", json={"student_ids": ids})
+
+    assert response.status_code == 400
+    assert not supabase_mock.requests
+
+
+def test_batch_history_splits_ids_over_short_urls(client, supabase_mock):
+    ids = [f"2026-BSCS-{i:05d}" for i in range(app_module.MAX_HISTORY_BATCH_SIZE)]
+
+    assert client.post("/fees/history/batch", json={"student_ids": ids}).status_code == 200
+
+    queries = supabase_mock.calls("GET", "/rest/v1/fee_ledger")
+    assert len(queries) == app_module.MAX_HISTORY_BATCH_SIZE // app_module.LEDGER_IN_CHUNK_SIZE
+    assert all(len(str(query.url)) < 4096 for query in queries)
+    queried = [sid for query in queries for sid in query.url.params["student_id"][4:-1].split(",")]
+    assert queried == ids
@@ -0,0 +1,78 @@
+import base64
+
+import httpx
+
+from conftest import json_body
+
+BEGIN = "/rest/v1/rpc/idempotency_begin"
+COMPLETE = "/rest/v1/rpc/idempotency_complete"
+PAY = "/rest/v1/rpc/fee_mark_paid"
+
+
+def supabase_answering(supabase_mock, begin: dict, pay_status: int = 200):
+    def respond(request):
+        if request.url.path == BEGIN:
+            return httpx.Response(200, json=[{"outcome": None, "status": None, "body": None, "headers": None, **begin}])
+        if request.url.path == PAY:
+            return httpx.Response(pay_status, json={"message": "unavailable"} if pay_status >= 400 else None)
+        return httpx.Response(204)
+    supabase_mock.respond = respond
+
+
+def pay(client, key="key-1", amount=100):
+    return client.post("/fees/pay", json={"student_id": "S1", "amount": amount}, headers={"Idempotency-Key": key})
+
+
+def test_first_request_claims_the_key_and_stores_its_response(client, supabase_mock):
+    supabase_answering(supabase_mock, {"outcome": "started"})
+
+    response = pay(client)
+
+    assert response.status_code == 200
+    begin, = supabase_mock.calls("POST", BEGIN)
+    assert json_body(begin)["p_key"] == "/fees/pay:key-1"
+    assert len(supabase_mock.calls("POST", PAY)) == 1
+    complete = json_body(supabase_mock.calls("POST", COMPLETE)[0])
+    assert complete["p_status"] == 200
+    assert base64.b64decode(complete["p_body"]) == response.get_data()
+
+
+def test_retry_replays_the_stored_response_without_writing(client, supabase_mock):
+    body = b'{"success":true}\n'
+    supabase_answering(supabase_mock, {"outcome": "replay", "status": 200,
+                                       "body": base64.b64encode(body).decode(),
+                                       "headers": {"Content-Type": "application/json"}})
+
+    response = pay(client)
+
+    assert response.status_code == 200
+    assert response.get_data() == body
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert not supabase_mock.calls("POST", PAY)
+
+
+def test_in_progress_and_mismatched_keys(client, supabase_mock):
+    supabase_answering(supabase_mock, {"outcome": "in_progress"})
+    assert pay(client).status_code == 409
+
+    supabase_answering(supabase_mock, {"outcome": "mismatch"})
+    assert pay(client, amount=5).status_code == 422
+    assert not supabase_mock.calls("POST", PAY)
+
+
+def test_failed_write_releases_the_key(client, supabase_mock):
+    supabase_answering(supabase_mock, {"outcome": "started"}, pay_status=503)
+
+    assert pay(client).status_code == 500
+
+    release, = supabase_mock.calls("DELETE", "/rest/v1/idempotency_keys")
+    assert release.url.params["key"] == "eq./fees/pay:key-1"
+    assert release.url.params["status"] == "is.null"
+    assert not supabase_mock.calls("POST", COMPLETE)
+
+
+def test_unreachable_store_refuses_the_write(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(503, json={"message": "down"})
+
+    assert pay(client).status_code == 503
+    assert not supabase_mock.calls("POST", PAY)
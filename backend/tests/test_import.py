@@ -0,0 +1,36 @@
+import httpx
+
+from conftest import json_body
+
+CSV = b"student_id,name,course\nS1,Alice,BSc\nS1,Alice Again,BSc\nS2,Bob,\n"
+
+
+def import_calls(supabase_mock):
+    return supabase_mock.calls("POST", "/rest/v1/rpc/students_import_batch")
+
+
+def test_batch_is_sent_as_one_rpc(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(200, json=[{"created": 1, "updated": 1}])
+
+    report = client.post("/students/import", data=CSV, content_type="text/csv").get_json()
+
+    calls = import_calls(supabase_mock)
+    assert len(calls) == 1
+    body = json_body(calls[0])
+    assert [row["student_id"] for row in body["p_rows"]] == ["S1", "S2"]
+    assert body["p_columns"] == ["student_id", "name", "course"]
+    assert report["processed"] == 3
+    assert (report["created"], report["updated"], report["failed"]) == (1, 1, 1)
+    assert report["errors"] == [{"row": 2, "student_id": "S1", "error": "Duplicate student_id in batch"}]
+
+
+def test_failed_batch_reports_each_row_once(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(400, json={"message": "boom", "code": "XX000"})
+
+    report = client.post("/students/import", data=b"student_id,name\nS1,A\nS1,B\n",
+                         content_type="text/csv").get_json()
+
+    assert report["processed"] == 2
+    assert report["failed"] == 2
+    assert [e["row"] for e in report["errors"]] == [2, 1]
+    assert report["created"] == report["updated"] == 0
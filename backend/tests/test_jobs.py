@@ -0,0 +1,39 @@
+import httpx
+
+import app as app_module
+from conftest import json_body
+
+OLD = "2020-01-01T00:00:00Z"
+NEW = "2999-01-01T00:00:00Z"
+
+
+def storage_objects(*objects):
+    return [{"name": name, "id": name, "created_at": created_at} for name, created_at in objects]
+
+
+def test_orphaned_photo_cleanup_is_opt_in():
+    assert app_module.JOB_ORPHANED_PHOTOS_INTERVAL == 0
+    assert app_module.job_scheduler.jobs["orphaned_photos"]["interval"] == 0
+
+
+def test_only_unreferenced_old_photos_are_removed(supabase_mock):
+    # Rows written through another hostname than this process's SUPABASE_URL
+    other_host = "https://db.internal:8443/storage/v1/object/public/student-photos"
+
+    def respond(request):
+        if request.url.path == "/rest/v1/students":
+            return httpx.Response(200, json=[
+                {"id": 1, "profile_pic_url": f"{other_host}/students/kept.webp",
+                 "profile_thumb_url": f"{other_host}/students/kept_thumb.webp?v=2"},
+                {"id": 2, "profile_pic_url": None, "profile_thumb_url": "https://elsewhere.example/a.png"},
+            ])
+        if request.url.path == "/storage/v1/object/list/student-photos":
+            return httpx.Response(200, json=storage_objects(
+                ("kept.webp", OLD), ("kept_thumb.webp", OLD), ("orphan.jpg", OLD), ("fresh.jpg", NEW)))
+        return httpx.Response(200, json=[])
+    supabase_mock.respond = respond
+
+    assert app_module.cleanup_orphaned_photos() == 1
+
+    remove, = supabase_mock.calls("DELETE", "/storage/v1/object/student-photos")
+    assert json_body(remove) == {"prefixes": ["students/orphan.jpg"]}
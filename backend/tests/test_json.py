@@ -0,0 +1,52 @@
+import json
+from decimal import Decimal
+from datetime import date
+
+import pytest
+from flask import jsonify
+
+import app as app_module
+
+orjson = pytest.importorskip("orjson")
+
+ROWS = [{"name": "Zoë", "id": 2, "amount": Decimal("10.50"), "dob": date(2001, 2, 3)}, {"id": 1, "name": None}]
+
+
+@pytest.fixture
+def orjson_calls(monkeypatch):
+    calls = []
+    real_dumps = orjson.dumps
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs.get("option"))
+        return real_dumps(*args, **kwargs)
+    monkeypatch.setattr(orjson, "dumps", spy)
+    return calls
+
+
+@pytest.mark.parametrize("debug", [False, True])
+def test_jsonify_encodes_with_orjson(orjson_calls, monkeypatch, debug):
+    monkeypatch.setattr(app_module.app, "debug", debug)
+    with app_module.app.app_context():
+        body = jsonify(ROWS).get_data(as_text=True)
+
+    assert len(orjson_calls) == 1
+    assert bool(orjson_calls[0] & orjson.OPT_INDENT_2) == debug
+    with app_module.app.app_context():
+        expected = app_module.DefaultJSONProvider(app_module.app).dumps(ROWS, separators=(",", ":"))
+    assert json.loads(body) == json.loads(expected)
+    assert body.index('"amount"') < body.index('"id"')  # keys stay sorted
+
+
+def test_listing_route_uses_orjson(client, orjson_calls):
+    client.get("/students")
+
+    assert orjson_calls
+
+
+def test_unsupported_arguments_fall_back_to_the_standard_encoder(orjson_calls):
+    with app_module.app.app_context():
+        body = app_module.app.json.dumps({"a": 1}, indent=4)
+
+    assert not orjson_calls
+    assert body == '{\n    "a": 1\n}'
@@ -0,0 +1,74 @@
+"""
+Bytes on the wire and server CPU per request for a 10k-row GET /fees/all,
+for every combination of body format (rows / ?format=columns), Content-Encoding
+(identity / gzip / br when brotli is installed) and encoder (orjson when
+installed / the standard library). Supabase is replaced by the mock transport,
+so the CPU figure covers parsing the PostgREST responses, resolving statuses,
+encoding and compressing; the encoding step alone is read from the
+Server-Timing header. Each figure is the median over RUNS requests, with the
+response cache cleared before each one.
+"""
+import re
+import time
+import statistics
+
+import httpx
+import pytest
+
+import app as app_module
+import compression
+
+STUDENTS = 10_000
+RUNS = 5
+
+ENCODINGS = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+ENCODERS = ["stdlib"] + (["orjson"] if app_module.orjson is not None else [])
+
+
+@pytest.fixture
+def fee_listing(supabase_mock):
+    students = [{"id": i, "student_id": f"2026-{i:05d}", "name": f"Student Number {i}", "course": "BS CS"}
+                for i in range(1, STUDENTS + 1)]
+    ledger = [{"id": s["id"], "student_id": s["student_id"], "status": ["paid", "unpaid", "overdue"][s["id"] % 3],
+               "amount": 1500 + s["id"] % 7 * 250, "paid_date": "2026-01-05" if s["id"] % 3 == 0 else None,
+               "due_date": None if s["id"] % 3 == 0 else "2026-02-01", "students": {"name": s["name"]}}
+              for s in students]
+    supabase_mock.respond = lambda request: httpx.Response(
+        200, json=students if request.url.path == "/rest/v1/students" else ledger)
+
+
+def measure(client, path: str, encoding: str) -> tuple:
+    """(wire bytes, median CPU ms, median wall ms, median JSON encoding ms) over RUNS requests"""
+    cpu, wall, serialize = [], [], []
+    for _ in range(RUNS):
+        app_module.response_cache.clear()
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        cpu.append((time.process_time() - cpu_started) * 1000)
+        wall.append((time.perf_counter() - wall_started) * 1000)
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding", "identity") == encoding
+        serialize.append(float(re.search(r"serialize;dur=([\d.]+)", response.headers["Server-Timing"]).group(1)))
+    return len(response.get_data()), statistics.median(cpu), statistics.median(wall), statistics.median(serialize)
+
+
+def test_fee_listing_bytes_and_cpu(client, fee_listing, monkeypatch):
+    real_orjson = app_module.orjson
+    results = {}
+    for encoder in ENCODERS:
+        monkeypatch.setattr(app_module, "orjson", real_orjson if encoder == "orjson" else None)
+        for body_format, path in (("rows", "/fees/all"), ("columns", "/fees/all?format=columns")):
+            for encoding in ENCODINGS:
+                results[(encoder, body_format, encoding)] = measure(client, path, encoding)
+
+    print(f"\nGET /fees/all, {STUDENTS} rows (median of {RUNS}):")
+    for (encoder, body_format, encoding), (size, cpu_ms, wall_ms, serialize_ms) in results.items():
+        print(f"{encoder:<7} {body_format:<8} {encoding:<9} {size / 1024:8.1f} KiB  "
+              f"cpu {cpu_ms:6.1f} ms  wall {wall_ms:6.1f} ms  json {serialize_ms:6.1f} ms")
+
+    encoder = ENCODERS[-1]
+    rows, columns = results[(encoder, "rows", "identity")], results[(encoder, "columns", "identity")]
+    assert columns[0] < rows[0]
+    assert results[(encoder, "rows", "gzip")][0] < rows[0] / 4
+    if "orjson" in ENCODERS:
+        assert results[("orjson", "rows", "identity")][3] < results[("stdlib", "rows", "identity")][3]
@@ -0,0 +1,190 @@
+"""
+Load test of GET /students and GET /fees/all against a stub PostgREST, at 1, 2
+and 4 gunicorn workers (WEB_THREADS each), or, where gunicorn is not installed,
+at 1, 2 and 4 server threads in this process. Reports requests per second and
+p50/p99 latency per endpoint. The response cache is off (CACHE_TTL=0), so
+every request reaches the stub.
+
+LOAD_TEST_REQUESTS (default 100) requests per endpoint and setting are sent
+from LOAD_TEST_CLIENTS (default 16) concurrent clients.
+"""
+import os
+import sys
+import time
+import socket
+import statistics
+import subprocess
+import threading
+from http.server import ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import httpx
+import pytest
+from werkzeug.serving import BaseWSGIServer
+
+import app as app_module
+from client import create_pooled_client
+from test_client import StubPostgrest
+
+REQUESTS = int(os.environ.get("LOAD_TEST_REQUESTS", 100))
+CLIENTS = int(os.environ.get("LOAD_TEST_CLIENTS", 16))
+SCALE = [1, 2, 4]
+STUDENTS = 500
+ENDPOINTS = ["/students?limit=100", "/fees/all"]
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import gunicorn  # noqa: F401
+except ImportError:
+    gunicorn = None
+
+
+class StubListings(StubPostgrest):
+    """
+    GET /rest/v1/students: STUDENTS rows (honouring limit)
+    GET /rest/v1/fee_ledger: one fee per student
+    each answered after `delay` seconds, like a database round trip
+    """
+    students = [{"id": i, "student_id": f"S{i:05d}", "name": f"Student {i}", "course": "BSc",
+                 "session": "2026", "email": f"s{i}@example.com"} for i in range(1, STUDENTS + 1)]
+    ledger = [{"id": i, "student_id": s["student_id"], "status": ["paid", "unpaid", "overdue"][i % 3],
+               "amount": 100, "paid_date": "2026-01-01" if i % 3 == 0 else None, "due_date": None,
+               "students": {"name": s["name"]}} for i, s in enumerate(students, 1)]
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        time.sleep(self.delay)
+        if url.path == "/rest/v1/students":
+            limit = int(params["limit"][0]) if "limit" in params else None
+            return self.reply(200, self.students[:limit])
+        if url.path == "/rest/v1/fee_ledger":
+            return self.reply(200, self.ledger)
+        self.reply(404, {"message": "not found"})
+
+
+@pytest.fixture
+def stub_listings_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubListings)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """werkzeug's server with requests handled on a fixed number of threads"""
+
+    def __init__(self, host: str, port: int, app, threads: int):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.handle_on_thread, request, client_address)
+
+    def handle_on_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/cache/stats", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def start_gunicorn(workers: int, supabase_url: str):
+    port = free_port()
+    env = {**os.environ, "SUPABASE_URL": supabase_url, "SUPABASE_KEY": "test-key",
+           "WEB_WORKERS": str(workers), "WEB_THREADS": "4", "BIND": f"127.0.0.1:{port}",
+           "WEB_ACCESS_LOG": "", "CACHE_TTL": "0", "CACHE_SHARED_INVALIDATION": "0", "JOBS_ENABLED": "0"}
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    wait_until_up(base_url)
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=30)
+    return base_url, stop
+
+
+def start_threaded(threads: int, supabase_url: str, monkeypatch):
+    client, transport = create_pooled_client(supabase_url, "test-key")
+    monkeypatch.setattr(app_module, "supabase", client)
+    monkeypatch.setattr(app_module.response_cache, "ttl", 0)
+    server = PooledWSGIServer("127.0.0.1", 0, app_module.app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+        server.pool.shutdown()
+        transport.close()
+    return base_url, stop
+
+
+def run_load(base_url: str, path: str) -> dict:
+    def call(_):
+        started = time.perf_counter()
+        response = http.get(f"{base_url}{path}")
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    limits = httpx.Limits(max_connections=CLIENTS, max_keepalive_connections=CLIENTS)
+    with httpx.Client(limits=limits, timeout=30) as http:
+        call(None)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+            results = list(pool.map(call, range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+
+    timings = sorted(ms for _, ms in results)
+    return {
+        "statuses": {status for status, _ in results},
+        "rps": REQUESTS / elapsed,
+        "p50": statistics.median(timings),
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+
+
+def test_listing_throughput_by_worker_count(stub_listings_url, monkeypatch):
+    unit = "workers" if gunicorn else "threads"
+    table = {}
+    for scale in SCALE:
+        if gunicorn:
+            base_url, stop = start_gunicorn(scale, stub_listings_url)
+        else:
+            base_url, stop = start_threaded(scale, stub_listings_url, monkeypatch)
+        try:
+            for path in ENDPOINTS:
+                table[(path, scale)] = run_load(base_url, path)
+        finally:
+            stop()
+
+    print(f"\n{REQUESTS} requests per row, {CLIENTS} concurrent clients, "
+          f"stub PostgREST answering in {StubListings.delay * 1000:.0f} ms")
+    for (path, scale), result in table.items():
+        print(f"{path:<22} {scale} {unit}: {result['rps']:7.1f} req/s, "
+              f"p50 {result['p50']:6.1f} ms, p99 {result['p99']:6.1f} ms")
+
+    assert all(result["statuses"] == {200} for result in table.values())
+    # A request mostly waits on Supabase, so more concurrency should add throughput
+    assert table[("/students?limit=100", SCALE[-1])]["rps"] > table[("/students?limit=100", SCALE[0])]["rps"]
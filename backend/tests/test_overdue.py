@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import httpx
+
+import app as app_module
+from conftest import json_body
+
+
+def test_sweep_moves_unpaid_fees_past_their_due_date(supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(204, headers={"Content-Range": "*/3"})
+
+    result = app_module.sweep_overdue_fees()
+
+    update, = supabase_mock.calls("PATCH", "/rest/v1/fee_ledger")
+    assert json_body(update) == {"status": "overdue"}
+    assert update.url.params["status"] == "eq.unpaid"
+    assert update.url.params["due_date"] == f"lt.{datetime.now():%Y-%m-%d}"
+    assert result["moved"] == 3
+
+
+def test_migrated_unpaid_fees_take_the_due_date_default(supabase_mock):
+    def respond(request):
+        if request.url.path == "/rest/v1/fees_unpaid" and request.url.params["id"] == "gt.0":
+            return httpx.Response(200, json=[{"id": 1, "student_id": "S1", "amount": "50"}])
+        if request.url.path == "/rest/v1/students":
+            return httpx.Response(200, json=[{"student_id": "S1"}])
+        return httpx.Response(200, json=[])
+    supabase_mock.respond = respond
+
+    result = app_module.migrate_legacy_fee_table("fees_unpaid", "unpaid")
+
+    upsert, = supabase_mock.calls("POST", "/rest/v1/fee_ledger")
+    entry, = json_body(upsert)
+    assert "due_date" not in entry
+    assert "missing=default" in upsert.headers["prefer"]
+    assert result["copied"] == 1
@@ -0,0 +1,90 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as app_module
+from conftest import json_body
+from images import process_profile_image, MAX_IMAGE_SIZE, THUMBNAIL_SIZE
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+
+def png(size: tuple) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, "white").save(out, "PNG")
+    return out.getvalue()
+
+
+def test_decompression_bomb_keeps_original(supabase_mock, monkeypatch):
+    # Twice the pixel limit makes Pillow raise DecompressionBombError (not an OSError)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    content = png((20, 20))
+
+    app_module.attach_profile_pic("S1", content, "students/bomb.png", "image/png")
+
+    uploads = supabase_mock.calls("POST", "/storage/v1/object/student-photos/students/bomb.png")
+    assert len(uploads) == 1
+    updates = supabase_mock.calls("PATCH", "/rest/v1/students")
+    assert json_body(updates[0]) == {"profile_pic_url": app_module.storage_public_url("students/bomb.png")}
+
+
+def test_processed_photo_replaces_uploaded_original(supabase_mock):
+    original_url = app_module.storage_public_url("students/photo.png")
+
+    app_module.attach_profile_pic("S1", png((40, 30)), "students/photo.png", "image/png", original_url)
+
+    paths = [r.url.path for r in supabase_mock.calls("POST")]
+    assert "/storage/v1/object/student-photos/students/photo.webp" in paths
+    assert "/storage/v1/object/student-photos/students/photo_thumb.webp" in paths
+    assert supabase_mock.calls("DELETE", "/storage/v1/object/student-photos")
+
+
+def test_processing_failure_is_logged_not_printed(supabase_mock, monkeypatch, caplog, capsys):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+
+    app_module.attach_profile_pic("S1", png((20, 20)), "students/bomb.png", "image/png")
+
+    assert "keeping original" in caplog.text
+    assert capsys.readouterr().out == ""
+
+
+# ---- Throughput of process_profile_image ----
+
+def camera_jpeg(size: tuple) -> bytes:
+    """A photo-like JPEG (smooth noise texture), so decoding and encoding cost what a real upload would"""
+    small = (size[0] // 8, size[1] // 8)
+    image = Image.merge("RGB", [Image.effect_noise(small, 40 + 10 * i) for i in range(3)]).resize(size, Image.BICUBIC)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("size", [(1600, 1200), (4000, 3000)])
+def test_process_profile_image_throughput(size):
+    content = camera_jpeg(size)
+    images = 8
+    process_profile_image(content)  # warm up codecs
+
+    started = time.perf_counter()
+    for _ in range(images):
+        image, thumbnail = process_profile_image(content)
+    serial = images / (time.perf_counter() - started)
+
+    workers = app_module.UPLOAD_WORKERS
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(process_profile_image, [content] * images))
+    pooled = images / (time.perf_counter() - started)
+
+    print(f"process_profile_image {size[0]}x{size[1]} ({len(content) / 1024:.0f} KiB JPEG): "
+          f"{serial:.1f} images/s on one thread, {pooled:.1f} images/s on {workers} upload workers; "
+          f"output {len(image) / 1024:.0f} KiB + {len(thumbnail) / 1024:.1f} KiB thumbnail")
+
+    with Image.open(io.BytesIO(image)) as out:
+        assert max(out.size) == MAX_IMAGE_SIZE
+    with Image.open(io.BytesIO(thumbnail)) as out:
+        assert max(out.size) == THUMBNAIL_SIZE
+    assert len(image) < len(content)
@@ -0,0 +1,89 @@
+"""
+Benchmark for search_students (readme.md) against a real database: seeds
+SEARCH_BENCH_STUDENTS students (default 100k) with a unique prefix, checks
+ranking and that p95 latency (measured at the client, HTTP round trip
+included) stays under SEARCH_P95_MS (default 50 ms), then deletes them.
+Skipped unless SUPABASE_TEST_URL and SUPABASE_TEST_KEY are set.
+"""
+import os
+import time
+import uuid
+import random
+import statistics
+
+import pytest
+from postgrest.types import ReturnMethod
+
+from client import create_pooled_client
+
+TEST_URL = os.environ.get("SUPABASE_TEST_URL")
+TEST_KEY = os.environ.get("SUPABASE_TEST_KEY")
+STUDENTS = int(os.environ.get("SEARCH_BENCH_STUDENTS", 100_000))
+P95_BUDGET_MS = float(os.environ.get("SEARCH_P95_MS", 50))
+SEED_BATCH_SIZE = 5000
+
+pytestmark = pytest.mark.skipif(not (TEST_URL and TEST_KEY),
+                                reason="SUPABASE_TEST_URL / SUPABASE_TEST_KEY not set")
+
+FIRST_NAMES = ["Ayesha", "Bilal", "Chen", "Daniel", "Fatima", "Hassan", "Irene", "Jamal", "Kiran", "Lucia",
+               "Mohammed", "Nadia", "Omar", "Priya", "Rahul", "Sara", "Tariq", "Usman", "Vera", "Zainab"]
+LAST_NAMES = ["Ahmed", "Brown", "Castillo", "Das", "Evans", "Farooq", "Garcia", "Haider", "Iqbal", "Khan",
+              "Lopez", "Malik", "Nguyen", "Okafor", "Patel", "Qureshi", "Rossi", "Siddiqui", "Tanaka", "Wong"]
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client, transport = create_pooled_client(TEST_URL, TEST_KEY)
+    prefix = f"bench{uuid.uuid4().hex[:6]}"
+    rng = random.Random(42)
+
+    for start in range(0, STUDENTS, SEED_BATCH_SIZE):
+        rows = []
+        for i in range(start, min(start + SEED_BATCH_SIZE, STUDENTS)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            rows.append({
+                "student_id": f"{prefix}-{i:06d}",
+                "name": f"{first} {last}",
+                "father_name": f"{rng.choice(FIRST_NAMES)} {last}",
+                "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+                "phone": f"03{rng.randrange(10**9):09d}",
+                "course": rng.choice(["BSc", "BBA", "BS CS", "MBA"]),
+            })
+        client.table("students").insert(rows, returning=ReturnMethod.minimal).execute()
+
+    yield client, prefix
+    client.table("students").delete().like("student_id", f"{prefix}-%").execute()
+    transport.close()
+
+
+def search(client, query: str, **filters) -> tuple:
+    params = {"p_query": query, "p_limit": 20, **{f"p_{k}": v for k, v in filters.items()}}
+    started = time.perf_counter()
+    rows = client.rpc("search_students", params).execute().data
+    return rows, (time.perf_counter() - started) * 1000
+
+
+def test_search_ranking(seeded):
+    client, prefix = seeded
+
+    rows, _ = search(client, f"{prefix}-000123")
+    assert rows[0]["student_id"] == f"{prefix}-000123"
+
+    # Typo: "Siddiqi" for "Siddiqui"
+    rows, _ = search(client, "siddiqi")
+    assert rows and any("Siddiqui" in row["name"] for row in rows)
+
+
+def test_search_latency(seeded):
+    client, prefix = seeded
+    queries = [f"{prefix}-0421", "fatima", "fati", "khan", "patell", "nguyen.okafor", "0300", "zainab rossi"]
+    for query in queries:  # warm up
+        search(client, query)
+
+    timings = [search(client, query)[1] for _ in range(10) for query in queries]
+    timings += [search(client, query, course="BBA")[1] for query in queries]
+
+    p50 = statistics.median(timings)
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"search_students over {STUDENTS} students: {len(timings)} calls, p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+    assert p95 <= P95_BUDGET_MS
@@ -0,0 +1,44 @@
+import httpx
+
+from conftest import json_body
+
+
+def test_delete_filters_on_row_id(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(200, json=[{"id": 7, "student_id": "S7"}])
+
+    response = client.delete("/students/7")
+
+    assert response.status_code == 200
+    delete, = supabase_mock.calls("DELETE", "/rest/v1/students")
+    assert delete.url.params["id"] == "eq.7"
+    assert "student_id" not in delete.url.params
+    # Fees go with the student through ON DELETE CASCADE, not a second request
+    assert not supabase_mock.calls(path="/rest/v1/fee_ledger")
+
+
+def test_delete_unknown_id_is_404(client, supabase_mock):
+    response = client.delete("/students/999")
+
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Student not found"}
+
+
+def test_update_filters_on_row_id(client, supabase_mock):
+    supabase_mock.respond = lambda request: httpx.Response(200, json=[{"id": 7, "name": "New"}])
+
+    response = client.put("/students/7", json={"name": "New", "student_id": "S8"})
+
+    assert response.status_code == 200
+    update, = supabase_mock.calls("PATCH", "/rest/v1/students")
+    assert update.url.params["id"] == "eq.7"
+    assert "student_id" not in update.url.params
+    assert json_body(update) == {"name": "New", "student_id": "S8"}
+    # A new name or student_id reaches the ledger at read time / through ON UPDATE CASCADE
+    assert len(supabase_mock.requests) == 1
+
+
+def test_update_unknown_id_is_404(client, supabase_mock):
+    response = client.put("/students/999", json={"name": "New"})
+
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "Student not found"}
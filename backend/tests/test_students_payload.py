@@ -0,0 +1,122 @@
+"""
+Payload size and latency of GET /students pages and of the fees page
+autocomplete, against the full-table dump the old endpoint returned.
+Supabase is replaced by an in-memory table behind the mock transport, so the
+numbers cover the app's own work: PostgREST response parsing, projection,
+serialization and compression.
+"""
+import json
+import time
+import statistics
+
+import httpx
+import pytest
+from flask import jsonify
+
+import app as app_module
+
+STUDENTS = 10_000
+RUNS = 5
+
+
+def synthetic_students(count: int) -> list:
+    return [{
+        "id": i, "student_id": f"2026-BSCS-{i:05d}", "name": f"Student Number {i}",
+        "father_name": f"Father Of {i}", "email": f"student{i}@example.com", "phone": f"0300{i:07d}",
+        "phone2": None, "emergency_contact": f"0311{i:07d}", "dob": "2004-05-06",
+        "address": f"House {i}, Street {i % 50}, Lahore", "gender": "Female" if i % 2 else "Male",
+        "profile_pic_url": f"http://localhost:8000/storage/v1/object/public/student-photos/students/{i:032x}.webp",
+        "profile_thumb_url": f"http://localhost:8000/storage/v1/object/public/student-photos/students/{i:032x}_thumb.webp",
+        "course": "BS CS", "session": "2026",
+    } for i in range(1, count + 1)]
+
+
+@pytest.fixture
+def students_table(supabase_mock):
+    rows = synthetic_students(STUDENTS)
+
+    def respond(request):
+        if request.url.path == "/rest/v1/rpc/search_students":
+            term = json.loads(request.content)["p_query"].lower()
+            return httpx.Response(200, json=[r for r in rows if term in r["name"].lower()][:20])
+
+        params = request.url.params
+        selected = rows
+        if params.get("id", "").startswith("gt."):
+            after = int(params["id"][3:])
+            selected = [r for r in selected if r["id"] > after]
+        if "limit" in params:
+            selected = selected[:int(params["limit"])]
+        columns = params.get("select", "*")
+        if columns != "*":
+            names = columns.split(",")
+            selected = [{name: r[name] for name in names} for r in selected]
+        return httpx.Response(200, json=selected)
+    supabase_mock.respond = respond
+    return rows
+
+
+def full_dump():
+    """GET /students before pagination: every column of every student in one body"""
+    return jsonify(app_module.supabase.table("students").select("*").execute().data)
+
+
+def measure(fetch) -> tuple:
+    """(body bytes, gzip bytes, median ms) over RUNS calls"""
+    timings = []
+    for _ in range(RUNS):
+        app_module.response_cache.clear()
+        started = time.perf_counter()
+        body, gzipped = fetch()
+        timings.append((time.perf_counter() - started) * 1000)
+    return len(body), len(gzipped), statistics.median(timings)
+
+
+def test_student_page_against_full_dump(client, students_table):
+    def old():
+        with app_module.app.test_request_context("/students"):
+            body = full_dump().get_data()
+        with app_module.app.test_request_context("/students", headers={"Accept-Encoding": "gzip"}):
+            gzipped = app_module.compress_response(full_dump()).get_data()
+        return body, gzipped
+
+    def page(query):
+        def fetch():
+            body = client.get(f"/students?{query}").get_data()
+            app_module.response_cache.clear()
+            gzipped = client.get(f"/students?{query}", headers={"Accept-Encoding": "gzip"}).get_data()
+            return body, gzipped
+        return fetch
+
+    results = {
+        "full dump (old)": measure(old),
+        "page of 100": measure(page("limit=100")),
+        "page of 100, 3 fields, columns": measure(page("limit=100&fields=id,student_id,name&format=columns")),
+    }
+    for name, (size, gzipped, ms) in results.items():
+        print(f"{name}: {size / 1024:.1f} KiB ({gzipped / 1024:.1f} KiB gzip), {ms:.1f} ms")
+
+    old_size, _, old_ms = results["full dump (old)"]
+    page_size, _, page_ms = results["page of 100"]
+    assert page_size < old_size / 50
+    assert page_ms < old_ms
+
+
+def test_autocomplete_against_loading_every_student(client, students_table):
+    def old():
+        # The fees page used to fetch the whole list once and filter it in the browser
+        with app_module.app.test_request_context("/students"):
+            body = full_dump().get_data()
+        return body, b""
+
+    def search():
+        body = client.get("/students/search?q=number 12&fields=id,student_id,name&limit=20").get_data()
+        return body, b""
+
+    old_size, _, old_ms = measure(old)
+    search_size, _, search_ms = measure(search)
+    print(f"autocomplete: full list {old_size / 1024:.1f} KiB in {old_ms:.1f} ms, "
+          f"search {search_size / 1024:.2f} KiB in {search_ms:.1f} ms")
+
+    assert search_size < old_size / 1000
+    assert search_ms < old_ms
@@ -0,0 +1,106 @@
+import time
+import queue
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class UploadQueue:
+    """
+    Bounded worker pool for storage uploads that run after the request returns.
+
+    Jobs are plain callables. A failing job is retried with exponential
+    backoff (plus jitter) up to `retries` times before it is dropped and logged.
+    `submit` never blocks: when the queue is full it returns False so the caller
+    can fall back to uploading inline.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 100, retries: int = 3, backoff: float = 0.5):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"upload-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job, *args) -> bool:
+        """
+        Queue `job(*args)`; returns False if the queue is full
+        """
+        self._start()
+        try:
+            self._queue.put_nowait((job, args))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Block until every queued job has finished (used by tests and shutdown).
+        With a timeout, give up after `timeout` seconds and return False.
+        """
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            job, args = self._queue.get()
+            try:
+                self._run_with_retry(job, args)
+            finally:
+                self._queue.task_done()
+
+    def _run_with_retry(self, job, args) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                job(*args)
+                with self._lock:
+                    self.completed += 1
+                return
+            except Exception:
+                if attempt == self.retries:
+                    logger.exception("Background upload failed after %d attempts", attempt + 1)
+                    with self._lock:
+                        self.failed += 1
+                    return
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "max_pending": self._queue.maxsize,
+                "workers": self.workers,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,47 @@
+"""
+Production WSGI entry point.
+
+Run with:  gunicorn -c gunicorn.conf.py wsgi:application
+(worker/thread counts, preload and shutdown timeouts are set in gunicorn.conf.py)
+"""
+import os
+import logging
+
+
+def configure_app(config: dict = None):
+    """
+    Prepare the Flask app for serving: turn the debugger off and route logs
+    through the server's handlers.
+
+    app.py builds the app, the Supabase client, caches and queues once, when it
+    is first imported, from environment variables, so every call configures and
+    returns that same app. `config` only updates Flask's app.config; app.py
+    settings (SUPABASE_URL, CACHE_TTL, ...) passed here raise ValueError, since
+    they must be set in the environment before the import.
+    """
+    import app as app_module
+    app = app_module.app
+
+    config = config or {}
+    settings = sorted(k for k in config if k.isupper() and hasattr(app_module, k))
+    if settings:
+        raise ValueError(f"{', '.join(settings)} are read from the environment when app.py "
+                         f"is imported; set them there instead of passing them to configure_app")
+
+    app.config.update(DEBUG=False, PROPAGATE_EXCEPTIONS=False)
+    app.config.update(config)
+
+    # Under gunicorn, log through its error log instead of Flask's default handler
+    gunicorn_logger = logging.getLogger("gunicorn.error")
+    if gunicorn_logger.handlers:
+        app.logger.handlers = gunicorn_logger.handlers
+        app.logger.setLevel(gunicorn_logger.level)
+        for name in ("uploads", "cache", "jobs"):
+            logging.getLogger(name).handlers = gunicorn_logger.handlers
+    else:
+        app.logger.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+
+    return app
+
+
+application = configure_app()
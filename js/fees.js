@@ -23,7 +23,6 @@ const cancelEditHistory = document.getElementById('cancelEditHistory');
 const closeEditHistory = document.getElementById('closeEditHistory');
 
 let allFees = [];
-let allStudents = [];
 let suggestionIndex = -1;
 let currentStudentId = '';
 let autocompleteInitialized = false;
@@ -31,47 +30,61 @@ let autocompleteInitialized = false;
 // =====================
 // Fetch + Render
 // =====================
+// Rebuild row objects from a ?format=columns response (one array per column)
+function fromColumns(payload) {
+  const names = Object.keys(payload.columns);
+  const rows = new Array(payload.length);
+  for (let i = 0; i < payload.length; i++) {
+    const row = {};
+    for (const name of names) row[name] = payload.columns[name][i];
+    rows[i] = row;
+  }
+  return rows;
+}
+
 async function fetchAllFees() {
   try {
-    const res = await fetch(`${API_BASE}/fees/all`);
-    allFees = await res.json();
-
-    for (let fee of allFees) {
-      if (fee.student_id) {
-        try {
-          const historyRes = await fetch(`${API_BASE}/fees/history/${fee.student_id}`);
-          const history = await historyRes.json();
-
-          if (history.length > 0) {
-            history.sort((a, b) => new Date(b.date) - new Date(a.date));
-            fee.amount = history[0].amount;
-          }
-        } catch (err) {
-          console.error(`Failed to load history for student ${fee.student_id}:`, err);
-        }
-      }
-    }
+    // Latest amounts are resolved server-side in the same request
+    const res = await fetch(`${API_BASE}/fees/all?include=latest_amount&format=columns`);
+    allFees = fromColumns(await res.json());
 
     renderFees(allFees);
+    fetchFeeSummary();
   } catch (err) {
     console.error('Failed to load fees:', err);
   }
 }
 
-async function fetchStudents() {
+async function fetchFeeSummary() {
   try {
-    const res = await fetch(`${API_BASE}/students`);
-    allStudents = await res.json();
-    localStorage.setItem('allStudents', JSON.stringify(allStudents));
+    // Precomputed on the server; size does not depend on the number of students
+    const res = await fetch(`${API_BASE}/fees/summary`);
+    const summary = await res.json();
+    const byStatus = summary.by_status || {};
+    const format = s => s ? `${s.count} · ${s.total.toFixed(2)}` : '-';
+
+    document.getElementById('summaryPaid').textContent = format(byStatus.paid);
+    document.getElementById('summaryUnpaid').textContent = format(byStatus.unpaid);
+    document.getElementById('summaryOverdue').textContent = format(byStatus.overdue);
+
+    const thisMonth = new Date().toISOString().slice(0, 7);
+    const month = (summary.monthly_collections || []).find(m => m.month === thisMonth);
+    document.getElementById('summaryMonth').textContent = month ? month.total.toFixed(2) : '0.00';
   } catch (err) {
-    console.error('Failed to load students:', err);
-    const storedStudents = localStorage.getItem('allStudents');
-    if (storedStudents) {
-      allStudents = JSON.parse(storedStudents);
-    }
+    console.error('Failed to load fee summary:', err);
   }
 }
 
+// Autocomplete suggestions: ranked search on any part of the name, student_id,
+// email or phone (GET /students/search), so a surname finds the student too
+const SUGGESTION_LIMIT = 20;
+async function searchStudents(term) {
+  const query = new URLSearchParams({ q: term, fields: 'id,student_id,name', limit: SUGGESTION_LIMIT });
+  const res = await fetch(`${API_BASE}/students/search?${query}`);
+  if (!res.ok) throw new Error('Failed to search students');
+  return res.json();
+}
+
 function renderFees(fees) {
   feesContainer.innerHTML = '';
   fees.forEach(fee => {
@@ -97,10 +110,29 @@ function renderFees(fees) {
 // =====================
 // Fee Actions
 // =====================
+// POST with an Idempotency-Key, retrying network errors and 5xx responses.
+// Every attempt reuses the key, so the server applies the write at most once.
+async function postIdempotent(url, options, retries = 2) {
+  const key = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch(url, {
+        ...options,
+        method: 'POST',
+        headers: { ...(options.headers || {}), 'Idempotency-Key': key }
+      });
+      if (response.status < 500 || attempt >= retries) return response;
+    } catch (err) {
+      if (attempt >= retries) throw err;
+    }
+    await new Promise(resolve => setTimeout(resolve, 300 * 2 ** attempt));
+  }
+}
+
 async function markPaid(student_id, amount) {
   try {
-    const paidRes = await fetch(`${API_BASE}/fees/paid`);
-    const paidFees = await paidRes.json();
+    const paidRes = await fetch(`${API_BASE}/fees/paid?format=columns`);
+    const paidFees = fromColumns(await paidRes.json());
     const studentHistory = paidFees.filter(f => f.student_id === student_id);
 
     if (studentHistory.length === 0) {
@@ -108,8 +140,7 @@ async function markPaid(student_id, amount) {
       return;
     }
 
-    const response = await fetch(`${API_BASE}/fees/pay`, {
-      method: 'POST',
+    const response = await postIdempotent(`${API_BASE}/fees/pay`, {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ student_id, amount })
     });
@@ -136,7 +167,8 @@ function openAddFeeModalForStudent(student_id, amount = '', status = 'paid') {
   const dateInput = addFeeForm.querySelector('input[name="date"]');
 
   if (studentIdInput) {
-    const student = allStudents.find(s => s.student_id === student_id);
+    // Every student is listed in /fees/all, which is already loaded
+    const student = allFees.find(s => s.student_id === student_id);
     if (student) {
       studentIdInput.value = `${student.name}: ${student.student_id}`;
     }
@@ -448,39 +480,52 @@ function setupNameAutocomplete() {
   const studentIdInput = addFeeForm.querySelector('input[name="student_id"]');
   if (!studentIdInput) return;
 
+  // Debounced; out-of-order responses are dropped so fast typing cannot show stale matches
+  let searchTimer = null;
+  let searchSeq = 0;
   studentIdInput.addEventListener('input', () => {
-    const query = studentIdInput.value.toLowerCase();
+    const query = studentIdInput.value.trim();
     suggestionIndex = -1;
-    suggestionBox.innerHTML = '';
+    clearTimeout(searchTimer);
 
     if (!query) {
+      searchSeq++;
+      suggestionBox.innerHTML = '';
       suggestionBox.classList.add('hidden');
       return;
     }
 
-    const matches = allStudents.filter(s =>
-      s.name.toLowerCase().includes(query) ||
-      (s.student_id && s.student_id.toLowerCase().includes(query))
-    );
-
-    if (matches.length === 0) {
-      suggestionBox.classList.add('hidden');
-      return;
-    }
+    searchTimer = setTimeout(async () => {
+      const seq = ++searchSeq;
+      let matches;
+      try {
+        matches = await searchStudents(query);
+      } catch (err) {
+        console.error('Failed to load suggestions:', err);
+        return;
+      }
+      if (seq !== searchSeq) return;
 
-    matches.forEach((s, i) => {
-      const option = document.createElement('div');
-      option.className = "px-3 py-2 cursor-pointer hover:bg-gray-700";
-      option.textContent = `${s.name}: ${s.student_id || 'N/A'}`;
-      option.dataset.value = `${s.name}: ${s.student_id || 'N/A'}`;
-      option.addEventListener('click', () => {
-        studentIdInput.value = `${s.name}: ${s.student_id || 'N/A'}`;
+      suggestionBox.innerHTML = '';
+      if (matches.length === 0) {
         suggestionBox.classList.add('hidden');
+        return;
+      }
+
+      matches.forEach(s => {
+        const option = document.createElement('div');
+        option.className = "px-3 py-2 cursor-pointer hover:bg-gray-700";
+        option.textContent = `${s.name}: ${s.student_id || 'N/A'}`;
+        option.dataset.value = `${s.name}: ${s.student_id || 'N/A'}`;
+        option.addEventListener('click', () => {
+          studentIdInput.value = `${s.name}: ${s.student_id || 'N/A'}`;
+          suggestionBox.classList.add('hidden');
+        });
+        suggestionBox.appendChild(option);
       });
-      suggestionBox.appendChild(option);
-    });
 
-    suggestionBox.classList.remove('hidden');
+      suggestionBox.classList.remove('hidden');
+    }, 200);
   });
 
   studentIdInput.addEventListener('keydown', e => {
@@ -539,25 +584,8 @@ historyDate?.addEventListener('change', async () => {
 // =====================
 // Init
 // =====================
-document.addEventListener('DOMContentLoaded', async () => {
-  const storedStudents = localStorage.getItem('allStudents');
-  if (storedStudents) {
-    allStudents = JSON.parse(storedStudents);
-  }
-
-  await fetchStudents();
+document.addEventListener('DOMContentLoaded', () => {
   setupNameAutocomplete();
+  // Overdue fees are moved by the server's scheduled overdue_sweep job
   fetchAllFees();
-
-  setInterval(async () => {
-    try {
-      await fetch(`${API_BASE}/fees/check_overdue`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
-      });
-      fetchAllFees();
-    } catch (err) {
-      console.error('Failed to check overdue fees:', err);
-    }
-  }, 24 * 60 * 60 * 1000);
 });
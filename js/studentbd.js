@@ -1,5 +1,6 @@
 // API Base URL
 const API_BASE = 'http://localhost:5000';
+const STUDENTS_PAGE_SIZE = 100;
 
 // DOM Elements
 const studentsContainer = document.getElementById('studentsContainer');
@@ -18,6 +19,7 @@ const editForm = document.getElementById('editForm');
 const addModal = document.getElementById('addModal');
 const closeAddModal = document.getElementById('closeAddModal');
 const addForm = document.getElementById('addForm');
+const loadMoreBtn = document.getElementById('loadMoreBtn');
 
 // Filter Elements
 const filterBtn = document.getElementById('filterBtn');
@@ -29,9 +31,11 @@ const applyFilters = document.getElementById('applyFilters');
 const clearFilters = document.getElementById('clearFilters');
 
 // State
-let allStudents = [];
 let currentStudent = null;
-let filteredStudents = [];
+let filteredStudents = []; // Rows loaded so far for the active filters
+let nextCursor = null; // X-Next-Cursor of the last loaded page (null when there is no more)
+let listSeq = 0; // Bumped when the filters change, so a late page of the old list is dropped
+let loadingMore = false;
 let currentFilters = {
     course: '',
     gender: '',
@@ -40,71 +44,122 @@ let currentFilters = {
 // Keyboard navigation state
 let selectedIndex = -1; // -1 means no selection
 
-// Fetch all students
+// Rebuild row objects from a ?format=columns response (one array per column)
+function fromColumns(payload) {
+    const names = Object.keys(payload.columns);
+    const rows = new Array(payload.length);
+    for (let i = 0; i < payload.length; i++) {
+        const row = {};
+        for (const name of names) row[name] = payload.columns[name][i];
+        rows[i] = row;
+    }
+    return rows;
+}
+
+// Fetch one page of /students matching the given filters
+async function fetchStudentPage(params = {}, after = null) {
+    const query = new URLSearchParams({ limit: STUDENTS_PAGE_SIZE, format: 'columns', ...params });
+    if (after) query.set('after', after);
+    
+    const response = await fetch(`${API_BASE}/students?${query}`);
+    if (!response.ok) {
+        throw new Error('Failed to fetch students');
+    }
+    
+    return {
+        students: fromColumns(await response.json()),
+        cursor: response.headers.get('X-Next-Cursor')
+    };
+}
+
+function activeFilterParams() {
+    const params = {};
+    for (const [key, value] of Object.entries(currentFilters)) {
+        if (value) params[key] = value;
+    }
+    return params;
+}
+
+// Load the first page of students (further pages are loaded on demand)
 async function fetchStudents() {
     try {
         loadingElement.classList.remove('hidden');
         emptyStateElement.classList.add('hidden');
         
-        const response = await fetch(`${API_BASE}/students`);
-        if (response.ok) {
-            const students = await response.json();
-            allStudents = students;
-            filteredStudents = [...allStudents];
-            renderStudents(filteredStudents);
-            populateSessionFilter(); // Populate session filter with unique sessions
-        } else {
-            throw new Error('Failed to fetch students');
-        }
-    } catch (error) {
-        console.error('Error fetching students:', error);
-        showError('Failed to load students');
+        await applyStudentFilters();
     } finally {
         loadingElement.classList.add('hidden');
     }
 }
 
-// Populate session filter with unique sessions
-function populateSessionFilter() {
-    // Clear existing options except the first one
-    while (filterSession.options.length > 1) {
-        filterSession.remove(1);
-    }
-    
-    // Get unique sessions from students
-    const sessions = [...new Set(allStudents.map(student => student.session).filter(session => session))];
+// Add sessions seen in newly loaded students to the session filter
+function populateSessionFilter(students) {
+    const known = new Set(Array.from(filterSession.options).map(option => option.value));
     
-    // Add sessions to filter dropdown
-    sessions.forEach(session => {
+    students.forEach(student => {
+        if (!student.session || known.has(student.session)) return;
+        known.add(student.session);
         const option = document.createElement('option');
-        option.value = session;
-        option.textContent = session;
+        option.value = student.session;
+        option.textContent = student.session;
         filterSession.appendChild(option);
     });
 }
 
-// Apply filters to students
-function applyStudentFilters() {
-    filteredStudents = allStudents.filter(student => {
-        // Course filter
-        if (currentFilters.course && student.course !== currentFilters.course) {
-            return false;
-        }
-        
-        // Gender filter
-        if (currentFilters.gender && student.gender !== currentFilters.gender) {
-            return false;
-        }
-        
-        // Session filter
-        if (currentFilters.session && student.session !== currentFilters.session) {
-            return false;
-        }
-        
-        return true;
-    });
+function isSearching() {
+    return searchInput.value.trim() !== '';
+}
+
+// Show "Load more" only for the paged list (not for search results) while pages remain
+function updateLoadMore() {
+    loadMoreBtn.classList.toggle('hidden', !nextCursor || isSearching());
+}
+
+// Reload the list from its first page with the active filters (filtered on the server)
+async function applyStudentFilters() {
+    const seq = ++listSeq;
+    let page;
+    try {
+        page = await fetchStudentPage(activeFilterParams());
+    } catch (error) {
+        console.error('Error fetching students:', error);
+        showError('Failed to load students');
+        return;
+    }
+    if (seq !== listSeq) return;
     
-    renderStudents(filteredStudents);
+    filteredStudents = page.students;
+    nextCursor = page.cursor;
+    populateSessionFilter(page.students);
+    if (!isSearching()) {
+        renderStudents(filteredStudents);
+    }
+    updateLoadMore();
+}
+
+// Append the next page of the current list
+async function loadMoreStudents() {
+    if (!nextCursor || loadingMore || isSearching()) return;
+    
+    const seq = listSeq;
+    loadingMore = true;
+    loadMoreBtn.disabled = true;
+    try {
+        const page = await fetchStudentPage(activeFilterParams(), nextCursor);
+        if (seq !== listSeq) return;
+        
+        filteredStudents = filteredStudents.concat(page.students);
+        nextCursor = page.cursor;
+        populateSessionFilter(page.students);
+        renderStudents(filteredStudents);
+    } catch (error) {
+        console.error('Error loading more students:', error);
+        showError('Failed to load more students');
+    } finally {
+        loadingMore = false;
+        loadMoreBtn.disabled = false;
+        updateLoadMore();
+    }
 }
 
 // Render students in the list
@@ -312,7 +367,7 @@ function showEditForm(student) {
                 <input type="file" accept="image/*" id="editProfilePic" onchange="previewEditImage(event)">
                 <label for="editProfilePic" class="absolute inset-0 flex flex-col items-center justify-center text-gray-400 hover:text-white" id="editUploadLabel">
                     ${student.profile_pic_url ? 
-                        `<img src="${student.profile_pic_url}" alt="${student.name}" class="w-full h-full object-cover rounded-lg">` :
+                        `<img src="${student.profile_thumb_url || student.profile_pic_url}" alt="${student.name}" class="w-full h-full object-cover rounded-lg">` :
                         `<svg xmlns="http://www.w3.org/2000/svg" class="h-10 w-10 mb-1" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                             <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M3 7h2l2-3h10l2 3h2v13H3V7z" />
                             <circle cx="12" cy="13" r="3" stroke="currentColor" stroke-width="2" fill="none" />
@@ -497,6 +552,25 @@ function showAddForm() {
     addModal.classList.remove('hidden');
 }
 
+// POST with an Idempotency-Key, retrying network errors and 5xx responses.
+// Every attempt reuses the key, so the server applies the write at most once.
+async function postIdempotent(url, options, retries = 2) {
+    const key = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(url, {
+                ...options,
+                method: 'POST',
+                headers: { ...(options.headers || {}), 'Idempotency-Key': key }
+            });
+            if (response.status < 500 || attempt >= retries) return response;
+        } catch (err) {
+            if (attempt >= retries) throw err;
+        }
+        await new Promise(resolve => setTimeout(resolve, 300 * 2 ** attempt));
+    }
+}
+
 // Handle add form submission
 async function handleAddSubmit(e) {
     e.preventDefault();
@@ -510,8 +584,7 @@ async function handleAddSubmit(e) {
     }
 
     try {
-        const res = await fetch(`${API_BASE}/submit`, {
-            method: "POST",
+        const res = await postIdempotent(`${API_BASE}/submit`, {
             body: formData,
         });
 
@@ -579,7 +652,6 @@ async function deleteStudent(studentId) {
         });
         
         if (response.ok) {
-            allStudents = allStudents.filter(s => s.id !== studentId);
             filteredStudents = filteredStudents.filter(s => s.id !== studentId);
             renderStudents(filteredStudents);
             hideModal();
@@ -846,89 +918,35 @@ async function updateStudent(studentData) {
 // });
 
 
-// Advanced search implementation
-function normalizeSearchText(text) {
-    if (!text) return '';
-    return text.toString()
-        .toLowerCase()
-        .trim()
-        .normalize('NFD').replace(/[\u0300-\u036f]/g, '') // Remove accents
-        .replace(/\s+/g, ' ') // Normalize whitespace
-        .replace(/[^\w\s]/gi, ''); // Remove special characters
-}
-
-function advancedSearch(term, text) {
-    if (!term || !text) return false;
-    
-    const normalizedTerm = normalizeSearchText(term);
-    const normalizedText = normalizeSearchText(text);
-    
-    if (normalizedTerm.length === 0) return false;
-    
-    // Exact match (highest priority)
-    if (normalizedText === normalizedTerm) return true;
-    
-    // Starts with term
-    if (normalizedText.startsWith(normalizedTerm)) return true;
-    
-    // Contains term as whole word
-    const words = normalizedText.split(/\s+/);
-    if (words.some(word => word === normalizedTerm)) return true;
-    
-    // Contains term anywhere
-    if (normalizedText.includes(normalizedTerm)) return true;
-    
-    // For very short terms, check if they're part of any word
-    if (normalizedTerm.length <= 2) {
-        if (words.some(word => word.startsWith(normalizedTerm))) return true;
-    }
-    
-    return false;
-}
-
-// Field-specific search weights
-const searchWeights = {
-    name: 4,
-    student_id: 3,
-    email: 3,
-    course: 2,
-    session: 2,
-    phone: 2,
-    phone2: 1,
-    father_name: 2,
-    gender: 2,
-    address: 1
-};
-
-// Search functionality with scoring
-function filterStudents(searchTerm) {
+// Search on the server (ranked, typo-tolerant, within the active filters).
+// Out-of-order responses are dropped so fast typing cannot show stale results.
+let searchSeq = 0;
+async function filterStudents(searchTerm) {
+    const seq = ++searchSeq;
     if (!searchTerm || searchTerm.trim() === '') {
         renderStudents(filteredStudents);
+        updateLoadMore();
         return;
     }
+    updateLoadMore();
     
-    const searchResults = filteredStudents.map(student => {
-        let score = 0;
-        let matchedFields = [];
-        
-        // Check each field with appropriate weight
-        for (const [field, weight] of Object.entries(searchWeights)) {
-            if (student[field] && advancedSearch(searchTerm, student[field])) {
-                score += weight;
-                matchedFields.push(field);
-            }
-        }
-        
-        return { student, score, matchedFields };
-    });
-    
-    // Filter out non-matching students and sort by relevance
-    const searchFiltered = searchResults
-        .filter(item => item.score > 0)
-        .sort((a, b) => b.score - a.score)
-        .map(item => item.student);
+    const query = new URLSearchParams({ q: searchTerm.trim(), limit: 100 });
+    for (const [key, value] of Object.entries(currentFilters)) {
+        if (value) query.set(key, value);
+    }
     
-    renderStudents(searchFiltered);
+    try {
+        const response = await fetch(`${API_BASE}/students/search?${query}`);
+        if (!response.ok) {
+            throw new Error('Search failed');
+        }
+        const results = await response.json();
+        if (seq === searchSeq) {
+            renderStudents(results);
+        }
+    } catch (error) {
+        console.error('Error searching students:', error);
+    }
 }
 
 // Simple and effective keyboard handler
@@ -1020,9 +1038,11 @@ function showSuccess(message) {
 }
 
 // Event Listeners
+let searchTimer = null;
 searchInput.addEventListener('input', (e) => {
     const searchTerm = e.target.value.trim();
-    filterStudents(searchTerm);
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => filterStudents(searchTerm), 150);
 });
 
 addStudentBtn.addEventListener('click', showAddForm);
@@ -1082,8 +1102,7 @@ clearFilters.addEventListener('click', () => {
         session: ''
     };
     
-    filteredStudents = [...allStudents];
-    renderStudents(filteredStudents);
+    applyStudentFilters();
     filterDropdown.classList.add('hidden');
 });
 
@@ -1106,5 +1125,13 @@ addModal.addEventListener('click', (e) => {
     if (e.target === addModal) hideModal();
 });
 
+// Load the next page when "Load more" is clicked or scrolled into view
+loadMoreBtn.addEventListener('click', loadMoreStudents);
+if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMoreStudents();
+    }, { rootMargin: '200px' }).observe(loadMoreBtn);
+}
+
 // Initialize
 document.addEventListener('DOMContentLoaded', fetchStudents);